@@ -0,0 +1,18 @@
+"""Network reliability simulation of lab 2, importable without side effects.
+
+Run the lab experiments with `python -m netsim` from the lab2 directory.
+"""
+from .estimators import ReliabilityEstimate, estimators
+from .exact import ReliabilityBounds
+from .failures import add_risk_group, set_survival_probability
+from .planning import CapacityPlanner, Plan
+from .profiling import Profiler, profiled
+from .routing import IncrementalRouting, PathIncidence
+from .sensitivity import EdgeImportance, SensitivityReport
+from .simulation import NetworkSimulation, bulk_is_connected
+from .stopping import AdaptiveEstimate, StoppingRule
+from .store import ResultStore, iter_records, iter_steps
+from .sweeps import run_experiments, run_sweep, sweep_states
+from .topology import (barabasi_albert_topology, build_base_topology, generated_topology, grid_topology,
+                       read_topology, waxman_topology)
+from .traffic import Demands
@@ -0,0 +1,175 @@
+"""Benchmarks of the lab 2 reliability simulator, with JSON baselines to compare commits.
+
+Run from the lab2 directory:
+    python -m netsim.bench                                   # print the results
+    python -m netsim.bench --save benchmarks/baseline.json   # record a baseline
+    python -m netsim.bench --compare benchmarks/baseline.json
+
+Every case builds its topology and traffic from a fixed seed and measures the routing of
+the intact graph, compute_a_values and calculate_T on damaged graphs the routing has not
+seen yet (so neither its last result nor its trees of the damaged state are cached), trials
+per second of the loop and batched engines and the peak memory of a batched run. --compare exits with status 1 when a metric
+got worse than the baseline by more than the tolerance.
+"""
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import networkx as nx
+import numpy as np
+
+from . import simulation, topology
+from .simulation import NetworkSimulation
+
+# name -> (topology, demand pairs or None for the dense N matrix, batched trials, loop trials)
+cases = {
+    'base': ('base', None, 2000, 200),
+    'grid-20x20': ('grid:20x20', 400, 500, 0),
+    'ba-2000': ('ba:2000', 2000, 200, 0),
+}
+p = 0.99  # Edge survival probability of the benchmark trials; high, so large graphs stay connected
+repeat = 3  # Timings are the best of this many runs
+tolerance = 0.2  # Relative slowdown reported as a regression by --compare
+
+
+def best_time(function):
+    """Return the shortest of `repeat` wall-clock times of function()."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def build_case(name):
+    """Return a NetworkSimulation of a benchmark case, built from a fixed seed."""
+    spec, pairs, _, _ = cases[name]
+    random.seed(name)
+    graph = topology.build_base_topology() if spec == 'base' else topology.generated_topology(spec)
+    network = NetworkSimulation(graph)
+    network.populate_N_matrix(pairs)
+    return network
+
+
+def damaged_graphs(network, count):
+    """Return count copies of the graph, each without a different edge whose loss keeps it connected."""
+    edges = list(network.graph.edges())
+    random.Random(0).shuffle(edges)
+    graphs = []
+    for u, v in edges:
+        graph = network.graph.copy()
+        graph.remove_edge(u, v)
+        if nx.is_connected(graph):
+            graphs.append(graph)
+            if len(graphs) == count:
+                break
+    return graphs
+
+
+def bench_case(name):
+    """Return the metrics of one benchmark case."""
+    _, _, batched_trials, loop_trials = cases[name]
+    network = build_case(name)
+    metrics = {'nodes': network.V, 'edges': network.graph.number_of_edges()}
+
+    def route():
+        network.routing = None
+        network.compute_a_values(network.graph)
+
+    metrics['routing_seconds'] = best_time(route)
+    graphs = iter(damaged_graphs(network, 2 * repeat))  # A new one for every run, so no run hits the cache
+    metrics['compute_a_values_seconds'] = best_time(lambda: network.compute_a_values(next(graphs)))
+    metrics['calculate_T_seconds'] = best_time(lambda: network.calculate_T(next(graphs), simulation.m))
+
+    def batched():
+        network.routing = None  # Include the routing cache warm-up, like a fresh sweep step
+        network.count_reliable(p, simulation.m, batched_trials, np.random.default_rng(0))
+
+    metrics['batched_trials_per_second'] = batched_trials / best_time(batched)
+    if loop_trials:
+        network.trials = loop_trials
+        random.seed(0)
+        metrics['loop_trials_per_second'] = loop_trials / best_time(lambda: network.simulate_reliability(p, simulation.m))
+
+    tracemalloc.start()
+    batched()
+    metrics['peak_memory_mb'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    return metrics
+
+
+def environment():
+    """Describe where the benchmarks ran, so baselines from different machines are told apart."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(), 'numpy': np.__version__,
+            'networkx': nx.__version__, 'machine': platform.machine(), 'processor': platform.processor()}
+
+
+def run_benchmarks(names=None, log=print):
+    """Run the benchmark cases and return {'environment': ..., 'cases': {name: metrics}}."""
+    results = {'environment': environment(), 'cases': {}}
+    for name in names or cases:
+        metrics = bench_case(name)
+        results['cases'][name] = metrics
+        log(f"{name}: " + ", ".join(f"{key}={value:.4g}" for key, value in metrics.items()))
+    return results
+
+
+def compare(results, baseline, tolerance=tolerance):
+    """Return a description of every metric that got worse than the baseline by more than tolerance.
+
+    Metrics ending in _per_second should grow, times and memory should shrink; cases or
+    metrics missing from either side are skipped.
+    """
+    regressions = []
+    for name, metrics in results['cases'].items():
+        for key, value in metrics.items():
+            old = baseline.get('cases', {}).get(name, {}).get(key)
+            if old is None or key in ('nodes', 'edges') or old <= 0 or value <= 0:
+                continue
+            change = old / value - 1 if key.endswith('_per_second') else value / old - 1
+            if change > tolerance:
+                regressions.append(f"{name} {key}: {old:.4g} -> {value:.4g} ({change:+.0%} worse)")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m netsim.bench',
+                                     description='Benchmarks of the lab 2 reliability simulator.')
+    parser.add_argument('cases', nargs='*', help=f"cases to run: {', '.join(cases)} (default: all)")
+    parser.add_argument('--save', metavar='JSON', help='write the results to a JSON baseline file')
+    parser.add_argument('--compare', metavar='JSON', help='compare the results with a JSON baseline file')
+    parser.add_argument('--tolerance', type=float, default=tolerance,
+                        help='relative slowdown reported as a regression (default: %(default)s)')
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.cases if name not in cases]
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(unknown)}")
+
+    results = run_benchmarks(args.cases)
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(results, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.compare} (commit {baseline['environment'].get('commit')})")
+
+
+if __name__ == '__main__':
+    main()
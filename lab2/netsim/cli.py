@@ -0,0 +1,139 @@
+import argparse
+import os
+import random
+
+import numpy as np
+
+from . import profiling, simulation, stopping, topology
+from .planning import CapacityPlanner
+from .sensitivity import format_importance
+from .simulation import NetworkSimulation
+from .store import ResultStore
+from .sweeps import run_experiments
+
+
+def build_parser():
+    """Return the argument parser of `python -m netsim`."""
+    parser = argparse.ArgumentParser(prog='python -m netsim',
+                                     description='Monte Carlo reliability experiments of the lab 2 network.')
+    parser.add_argument('--topology', default='base',
+                        help="'base' for the 20-node lab topology, a generated 'grid:ROWSxCOLUMNS', "
+                             "'waxman:N' or 'ba:N' topology, or a path to a 'u v capacity' edge list")
+    parser.add_argument('-V', '--vertices', type=int, default=None,
+                        help='number of vertices; must match the topology (default: taken from it)')
+    parser.add_argument('-m', type=float, default=simulation.m, help='average packet size in bits')
+    parser.add_argument('--T-max', type=float, default=simulation.T_max,
+                        help='maximum acceptable average packet delay')
+    parser.add_argument('--pairs', type=int, default=None,
+                        help='number of node pairs with traffic (default: all pairs, or V pairs on large networks)')
+    parser.add_argument('-p', type=float, default=simulation.initial_p,
+                        help='probability that an edge is not damaged')
+    parser.add_argument('--trials', type=int, default=simulation.trials, help='trials per step')
+    parser.add_argument('--steps', type=int, default=simulation.steps, help='steps of every experiment')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per CPU)')
+    parser.add_argument('--common-scenarios', action='store_true',
+                        help='reuse one block of failure scenarios across the steps of every sweep')
+    parser.add_argument('--half-width', type=float, default=None,
+                        help='run every step until its confidence interval is at most this wide on each side')
+    parser.add_argument('--relative-error', type=float, default=None,
+                        help='run every step until the interval half-width is at most this fraction of the estimate')
+    parser.add_argument('--interval', choices=sorted(stopping.intervals), default='wilson',
+                        help='confidence interval of the adaptive stopping rule')
+    parser.add_argument('--max-trials', type=int, default=stopping.StoppingRule().max_trials,
+                        help='trial budget of every step with adaptive stopping')
+    parser.add_argument('--seed', type=int, default=None, help='seed for reproducible runs')
+    parser.add_argument('--store', metavar='JSONL', default=None,
+                        help='append every finished step to this file and resume an interrupted run from it')
+    parser.add_argument('--plan', type=float, metavar='TARGET', default=None,
+                        help='instead of the experiments, search for cheap capacity upgrades and new links '
+                             'that reach this reliability')
+    parser.add_argument('--plan-moves', type=int, default=20, help='most upgrades a plan may contain')
+    parser.add_argument('--importance', type=int, metavar='TOP', default=None,
+                        help='instead of the experiments, rank the edges by Birnbaum importance and print the '
+                             'TOP most important ones (0 for all)')
+    parser.add_argument('--profile', action='store_true',
+                        help='print per-phase timings and trial outcome counts (runs in one process)')
+    parser.add_argument('--trace', metavar='JSON', default=None,
+                        help='also write the profiled phases as a Chrome trace file (implies --profile)')
+    parser.add_argument('--plot', action='store_true', help='draw the topology and the reliability curves')
+    return parser
+
+
+def load_topology(parser, args):
+    """Build the topology selected on the command line and check it against --vertices."""
+    try:
+        if args.topology == 'base':
+            graph = topology.build_base_topology()
+        elif ':' in args.topology and not os.path.exists(args.topology):
+            graph = topology.generated_topology(args.topology)
+        else:
+            graph = topology.read_topology(args.topology)
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+    if args.vertices is not None and args.vertices != graph.number_of_nodes():
+        parser.error(f"topology '{args.topology}' has {graph.number_of_nodes()} vertices, not {args.vertices}")
+    return graph
+
+
+def command_params(args):
+    """Return the arguments that shape the results of a call, the ones a stored command is matched by."""
+    ignored = ('seed', 'store', 'workers', 'profile', 'trace', 'plot')
+    return {name: value for name, value in vars(args).items() if name not in ignored}
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    store = ResultStore(args.store) if args.store else None
+    command = None
+    if store is not None and args.seed is None and args.plan is None and args.importance is None:
+        # A new seed would draw another network, so a restart could not resume; keep the seed in the store
+        command, args.seed = store.open_command(command_params(args))
+    if args.seed is not None:
+        random.seed(args.seed)  # Capacities and the traffic matrix come from the random module
+
+    rule = None
+    if args.half_width is not None or args.relative_error is not None:
+        if args.common_scenarios:
+            parser.error("--common-scenarios cannot be combined with adaptive stopping")
+        rule = stopping.StoppingRule(args.half_width, args.relative_error, interval=args.interval,
+                                     max_trials=args.max_trials)
+
+    graph = load_topology(parser, args)
+    if args.plot:
+        from .plotting import draw_topology
+        draw_topology(graph)
+
+    network = NetworkSimulation(graph, args.T_max, args.trials)
+    network.populate_N_matrix(args.pairs)  # Initial N matrix
+    if args.importance is not None:
+        report = network.edge_importance(args.p, args.m, args.trials, np.random.default_rng(args.seed))
+        print(format_importance(report, args.importance or None))
+        return
+    if args.plan is not None:
+        planner = CapacityPlanner(network, args.p, args.m, args.trials, args.plan, n_workers=args.workers,
+                                  seed=args.seed)
+        plan = planner.plan(args.plan_moves, log=print)
+        print(f"{'Reached' if plan.target_met else 'Did not reach'} {args.plan} with {len(plan.moves)} upgrades "
+              f"costing {plan.cost:.1f}: reliability {plan.reliability} ({plan.evaluations} networks simulated)")
+        return
+
+    if args.profile or args.trace:
+        # Worker processes cannot report back their timings, so profiled sweeps run in this process
+        with profiling.profiled(trace=args.trace is not None) as profiler:
+            reliabilities = run_experiments(network, args.p, args.m, args.trials, args.steps, 1, args.seed,
+                                            common=args.common_scenarios, rule=rule, store=store)
+        print(profiler.format_report())
+        if args.trace:
+            profiler.write_chrome_trace(args.trace)
+    else:
+        reliabilities = run_experiments(network, args.p, args.m, args.trials, args.steps, args.workers, args.seed,
+                                        common=args.common_scenarios, rule=rule, store=store)
+    if command is not None:
+        store.finish_command(command)
+    if rule is not None:
+        reliabilities = [[estimate.reliability for estimate in curve] for curve in reliabilities]
+
+    if args.plot:
+        from .plotting import plot_reliabilities
+        plot_reliabilities(*reliabilities)
@@ -0,0 +1,165 @@
+"""Reliability estimators built on NetworkSimulation.evaluate_survival.
+
+Every estimator takes (simulation, p, m, n_trials, rng, **options) and returns a
+ReliabilityEstimate. effective_samples is the number of crude Monte Carlo trials that would
+reach the same variance, R (1 - R) / variance, so estimators can be compared directly.
+"""
+from collections import namedtuple
+import itertools
+import math
+
+import networkx as nx
+import numpy as np
+
+ReliabilityEstimate = namedtuple('ReliabilityEstimate', ['reliability', 'variance', 'n_trials', 'effective_samples'])
+
+
+def make_estimate(reliability, variance, n_trials):
+    """Wrap an estimate and its variance, filling in the effective number of samples."""
+    bounded = min(max(reliability, 0.0), 1.0)
+    if variance > 0:
+        effective_samples = bounded * (1 - bounded) / variance
+    else:
+        effective_samples = float(n_trials)
+    return ReliabilityEstimate(float(reliability), float(variance), int(n_trials), float(effective_samples))
+
+
+def sample_variance(values):
+    """Return the variance of the mean of the given samples."""
+    return values.var(ddof=1) / len(values) if len(values) > 1 else 0.0
+
+
+def smoothed_variance(values):
+    """Return the variance of the mean of samples in [0, 1] with half a pseudo-sample added.
+
+    The pseudo-sample sits at 0 or 1, whichever is farther from the mean, as if the rare
+    outcome had been seen half a time. A run that never met it then reports the spread of
+    (0.5 / n) instead of zero, and no huge effective sample count; with it met, this is
+    close to sample_variance.
+    """
+    if not len(values):
+        return 0.0
+    n = len(values)
+    far = 0.0 if values.mean() > 0.5 else 1.0
+    mean = (values.sum() + 0.5 * far) / (n + 0.5)
+    spread = (((values - mean) ** 2).sum() + 0.5 * (far - mean) ** 2) / (n + 0.5)
+    return spread / n
+
+
+def crude_estimate(simulation, p, m, n_trials, rng):
+    """Plain Monte Carlo: the fraction of independent trials that leave the network reliable."""
+    survival = simulation.draw_survival_mask(n_trials, simulation.graph.number_of_edges(), p, rng)
+    outcomes = simulation.evaluate_survival(survival, m).astype(float)
+    return make_estimate(outcomes.mean(), sample_variance(outcomes), n_trials)
+
+
+def stratified_estimate(simulation, p, m, n_trials, rng, pilot_fraction=0.1, enumerate_fraction=0.1):
+    """Stratify the trials by the number k of failed edges, which is Binomial(E, 1 - p).
+
+    Strata with more than E - (V - 1) failures cannot be connected and are known to be
+    unreliable; strata of at most enumerate_fraction * n_trials states, or small enough to
+    fit their share of trials, are enumerated exactly. A pilot run with proportional
+    allocation estimates the spread of every stratum, and the remaining trials follow the
+    Neyman allocation P(k) * std(k). The spread of a sampled stratum is the smoothed_variance
+    of its outcomes, both for the allocation and for the reported variance.
+    """
+    n_edges = simulation.graph.number_of_edges()
+    max_failures = n_edges - (simulation.graph.number_of_nodes() - 1)
+    weights = np.array([math.comb(n_edges, k) * (1 - p) ** k * p ** (n_edges - k) for k in range(n_edges + 1)])
+    strata = [k for k in range(max_failures + 1) if weights[k] > 0]
+    outcomes = {k: np.empty(0) for k in strata}
+    exact = {}
+
+    def run(allocation):
+        for k, n_k in allocation.items():
+            if k in exact or n_k <= 0:
+                continue
+            if math.comb(n_edges, k) <= n_k + len(outcomes[k]):
+                survival = np.ones((math.comb(n_edges, k), n_edges), dtype=bool)
+                for row, failed in enumerate(itertools.combinations(range(n_edges), k)):
+                    survival[row, list(failed)] = False
+                exact[k] = simulation.evaluate_survival(survival, m).mean()
+                outcomes[k] = np.empty(0)
+                continue
+            # k failed edges chosen uniformly: the first k columns of a random permutation
+            failed = np.argsort(rng.random((n_k, n_edges)), axis=1)[:, :k]
+            survival = np.ones((n_k, n_edges), dtype=bool)
+            np.put_along_axis(survival, failed, False, axis=1)
+            new = simulation.evaluate_survival(survival, m).astype(float)
+            outcomes[k] = np.concatenate([outcomes[k], new])
+
+    run({k: math.comb(n_edges, k) for k in strata if math.comb(n_edges, k) <= enumerate_fraction * n_trials})
+    total = weights[strata].sum() if strata else 0.0
+    n_pilot = max(2 * len(strata), int(pilot_fraction * n_trials))
+    run({k: max(2, round(n_pilot * weights[k] / total)) for k in strata if k not in exact})
+    used = sum(len(outcomes[k]) for k in strata) + sum(math.comb(n_edges, k) for k in exact)
+
+    # Neyman allocation with a smoothed Bernoulli spread, so no stratum is starved by a lucky pilot
+    sampled = [k for k in strata if k not in exact]
+    spread = {k: weights[k] * math.sqrt(smoothed_variance(outcomes[k]) * len(outcomes[k])) for k in sampled}
+    remaining = n_trials - used
+    if remaining > 0 and sampled:
+        scale = sum(spread.values())
+        run({k: round(remaining * spread[k] / scale) for k in sampled})
+        used = sum(len(outcomes[k]) for k in strata) + sum(math.comb(n_edges, k) for k in exact)
+
+    reliability = sum(weights[k] * exact[k] for k in exact)
+    variance = 0.0
+    for k in strata:
+        if k not in exact:
+            reliability += weights[k] * outcomes[k].mean()
+            variance += weights[k] ** 2 * smoothed_variance(outcomes[k])
+    return make_estimate(reliability, variance, used)
+
+
+def importance_estimate(simulation, p, m, n_trials, rng, failure_probability=None):
+    """Importance sampling with a tilted edge-failure probability and likelihood-ratio weights.
+
+    Failures are drawn with failure_probability instead of 1 - p (by default large enough to
+    expect as many failed edges as the smallest edge cut), and every trial is weighted by
+    P(state) / Q(state). The unreliability 1 - R is estimated, since that is the rare event.
+    """
+    graph = simulation.graph
+    n_edges = graph.number_of_edges()
+    if failure_probability is None:
+        cut = nx.edge_connectivity(graph) if nx.is_connected(graph) else 0
+        failure_probability = max(1 - p, min(0.5, cut / n_edges))
+    survival = rng.random((n_trials, n_edges)) > failure_probability
+    n_failed = n_edges - survival.sum(axis=1)
+    likelihood_ratio = ((p / (1 - failure_probability)) ** (n_edges - n_failed)
+                        * ((1 - p) / failure_probability) ** n_failed)
+    failures = likelihood_ratio * ~simulation.evaluate_survival(survival, m)
+    return make_estimate(1 - failures.mean(), sample_variance(failures), n_trials)
+
+
+def conditional_estimate(simulation, p, m, n_trials, rng, conditional_edges=None):
+    """Conditional Monte Carlo: sample all edges but a few and average those few out exactly.
+
+    Every trial is replaced by its expectation over the 2^c states of the conditional edges
+    (by default a minimum edge cut), which can only lower the variance. conditional_edges
+    are column indices in simulation.graph.edges() order. The values only differ when the
+    sampled edges matter, which is as rare as with crude trials, so the reported variance is
+    their smoothed_variance.
+    """
+    graph = simulation.graph
+    edges = list(graph.edges())
+    if conditional_edges is None:
+        edge_ids = {frozenset(edge): k for k, edge in enumerate(edges)}
+        cut = nx.minimum_edge_cut(graph) if nx.is_connected(graph) else set()
+        conditional_edges = sorted(edge_ids[frozenset(edge)] for edge in cut)
+    columns = list(conditional_edges)
+    survival = rng.random((n_trials, len(edges))) <= p
+    values = np.zeros(n_trials)
+    for states in itertools.product([True, False], repeat=len(columns)):
+        survival[:, columns] = states
+        probability = math.prod(p if alive else 1 - p for alive in states)
+        values += probability * simulation.evaluate_survival(survival, m)
+    return make_estimate(values.mean(), smoothed_variance(values), n_trials)
+
+
+estimators = {
+    'crude': crude_estimate,
+    'stratified': stratified_estimate,
+    'importance': importance_estimate,
+    'conditional': conditional_estimate,
+}
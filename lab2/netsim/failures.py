@@ -0,0 +1,86 @@
+"""Per-edge survival probabilities and shared-risk link groups.
+
+By default every edge survives a trial independently with the same probability p, as in
+the lab. An edge can have its own survival probability in its 'p' attribute, and
+graph.graph['risk_groups'] can list shared-risk link groups as (edges, p) pairs: with
+probability 1 - p the whole group fails at once (fibres in one conduit), on top of the
+failures of its edges. Both are plain graph data, so they are kept by graph.copy() and go
+to worker processes together with the graph.
+
+A batch of trials is drawn with one rng.random((trials, edges + groups)) call: an edge
+survives when its own draw is at most its probability and none of its groups failed.
+"""
+import numpy as np
+
+
+def set_survival_probability(graph, u, v, p):
+    """Give the edge (u, v) its own survival probability instead of the global p."""
+    graph[u][v]['p'] = p
+
+
+def add_risk_group(graph, edges, p):
+    """Add a shared-risk link group: with probability 1 - p all of its edges fail together."""
+    missing = [edge for edge in edges if not graph.has_edge(*edge)]
+    if missing:
+        raise ValueError(f"risk group edges not in the graph: {missing}")
+    graph.graph['risk_groups'] = graph.graph.get('risk_groups', []) + [(list(edges), p)]
+
+
+def is_uniform(graph):
+    """Tell whether every edge fails independently with the global p, the lab's model."""
+    return not graph.graph.get('risk_groups') and all('p' not in data for _, _, data in graph.edges(data=True))
+
+
+def group_count(graph):
+    """Return the number of risk groups, the extra draws every trial needs."""
+    return len(graph.graph.get('risk_groups', []))
+
+
+def edge_probabilities(graph, p):
+    """Return the own survival probability of every edge in graph.edges() order, p when it has none."""
+    return np.array([data.get('p', p) for _, _, data in graph.edges(data=True)], dtype=float)
+
+
+def group_membership(graph):
+    """Return the survival probability of every risk group and a (groups x edges) membership matrix.
+
+    Group edges that are no longer in the graph (removed by a damaged copy) are ignored.
+    """
+    groups = graph.graph.get('risk_groups', [])
+    index = {frozenset(edge): k for k, edge in enumerate(graph.edges())}
+    membership = np.zeros((len(groups), len(index)), dtype=np.int32)
+    for row, (edges, _) in enumerate(groups):
+        for edge in edges:
+            column = index.get(frozenset(edge))
+            if column is not None:
+                membership[row, column] = 1
+    return np.array([p for _, p in groups], dtype=float), membership
+
+
+def marginal_survival(graph, p):
+    """Return the probability that every edge survives a trial: its own p times that of its groups."""
+    group_p, membership = group_membership(graph)
+    return edge_probabilities(graph, p) * np.prod(np.where(membership == 1, group_p[:, None], 1.0), axis=0)
+
+
+def survival_from_draws(graph, draws, p):
+    """Turn a (trials x (edges + groups)) matrix of uniform draws into edge survival flags.
+
+    With the uniform model there are no group columns and this is draws <= p.
+    """
+    if is_uniform(graph):
+        return draws <= p
+    n_edges = graph.number_of_edges()
+    survival = draws[:, :n_edges] <= edge_probabilities(graph, p)
+    group_p, membership = group_membership(graph)
+    if len(group_p):
+        failed_groups = (draws[:, n_edges:] > group_p).astype(np.int32)
+        survival &= (failed_groups @ membership) == 0
+    return survival
+
+
+def require_uniform(graph, feature):
+    """Raise a ValueError when a feature that assumes one global p meets per-edge probabilities or groups."""
+    if not is_uniform(graph):
+        raise ValueError(f"{feature} assumes every edge fails independently with the same p; "
+                         "this network has per-edge probabilities or risk groups")
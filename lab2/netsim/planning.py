@@ -0,0 +1,159 @@
+"""Capacity planning: cheap capacity upgrades and new links that reach a target reliability.
+
+Experiments 2 and 3 raise every capacity at once or add random edges. CapacityPlanner
+searches greedily instead: every round it tries each single move from the current network,
+raising the capacity of one edge by capacity_step of its capacity or adding a link of
+average capacity between two nodes that are not adjacent, and applies the move with the
+best reliability gain per cost, until the target is reached.
+
+The moves of a round are first ranked by a surrogate estimate on the first
+surrogate_trials scenarios, and only the best `confirm` of them are evaluated on all
+n_trials. Every evaluation uses one shared ScenarioBlock (common random numbers), so
+candidates are compared on the same failures and a network always gets the same estimate;
+estimates are cached by network_fingerprint and never computed twice. The candidates of a
+round are evaluated together over a process pool, with the capacity moves side by side so
+they share connectivity and routing in common_reliability_chunk.
+"""
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+import networkx as nx
+import numpy as np
+
+from .failures import require_uniform
+from .scenarios import ScenarioBlock
+from .store import network_fingerprint
+from .sweeps import chunk_trials, common_reliability_chunk
+
+Move = namedtuple('Move', ['kind', 'edge', 'capacity', 'cost'])  # kind is 'capacity' or 'link'
+Plan = namedtuple('Plan', ['moves', 'cost', 'reliability', 'target_met', 'evaluations'])
+
+
+class CapacityPlanner:
+    """Greedy search for the cheapest moves that bring a network to a target reliability."""
+
+    def __init__(self, simulation, p, m, n_trials, target, surrogate_trials=200, confirm=3, capacity_step=0.5,
+                 capacity_cost=1.0, link_cost=None, candidate_links=None, n_workers=None, seed=None):
+        """Plan upgrades of the simulation's network; the simulation itself is left unchanged.
+
+        A capacity move costs capacity_cost per unit of added capacity, a new link costs
+        link_cost (by default the price of an average capacity) plus its capacity.
+        candidate_links are the node pairs where links may be added, by default every pair
+        that is not adjacent; pass a shorter list for large networks.
+        """
+        self.simulation = simulation
+        self.p = p
+        self.m = m
+        self.n_trials = n_trials
+        self.target = target
+        self.surrogate_trials = min(surrogate_trials, n_trials)
+        self.confirm = confirm
+        self.capacity_step = capacity_step
+        self.capacity_cost = capacity_cost
+        self.link_cost = simulation.average_capacity() * capacity_cost if link_cost is None else link_cost
+        graph = simulation.graph
+        if candidate_links is None:
+            candidate_links = [(u, v) for u, v in nx.non_edges(graph)]
+        self.candidate_links = [(u, v) for u, v in candidate_links if u != v and not graph.has_edge(u, v)]
+        self.n_workers = (os.cpu_count() or 1) if n_workers is None else n_workers
+        self.seed = np.random.SeedSequence(seed)
+        self.cache = {}  # (network_fingerprint, trials) -> reliability
+        self.evaluations = 0  # Networks actually simulated, cache hits excluded
+        self.block = None
+        self.pool = None
+
+    def moves(self, graph):
+        """Return every single move from the graph as (Move, upgraded graph), capacity moves first."""
+        candidates = []
+        for u, v, data in graph.edges(data=True):
+            added = data['c'] * self.capacity_step
+            upgraded = graph.copy()
+            upgraded[u][v]['c'] += added
+            candidates.append((Move('capacity', (u, v), added, added * self.capacity_cost), upgraded))
+        capacity = sum(data['c'] for _, _, data in graph.edges(data=True)) / max(graph.number_of_edges(), 1)
+        for u, v in self.candidate_links:
+            if not graph.has_edge(u, v):
+                upgraded = graph.copy()
+                upgraded.add_edge(u, v, c=capacity)
+                candidates.append((Move('link', (u, v), capacity, self.link_cost + capacity * self.capacity_cost),
+                                   upgraded))
+        return candidates
+
+    def count(self, graphs, n_trials):
+        """Count the reliable scenarios of every graph among the first n_trials of the block."""
+        N_matrix, T_max = self.simulation.N_matrix, self.simulation.T_max
+        states = [(graph, N_matrix) for graph in graphs]
+        columns = [self.block.columns(graph) for graph in graphs]
+        size = -(-len(states) // self.n_workers)
+        groups = [range(start, min(start + size, len(states))) for start in range(0, len(states), size)]
+        tasks, owners = [], []
+        for group in groups:
+            for start in range(0, n_trials, chunk_trials):
+                tasks.append(([states[index] for index in group], [columns[index] for index in group], self.p,
+                              self.m, T_max, self.block.rows(start, min(start + chunk_trials, n_trials)),
+                              self.block.n_columns))
+                owners.append(group)
+        if self.pool is None:
+            results = [common_reliability_chunk(*task) for task in tasks]
+        else:
+            results = list(self.pool.map(common_reliability_chunk, *zip(*tasks)))
+        counts = [0] * len(states)
+        for group, group_counts in zip(owners, results):
+            for index, count in zip(group, group_counts):
+                counts[index] += count
+        return counts
+
+    def evaluate(self, graphs, n_trials):
+        """Return the estimated reliability of every graph on n_trials shared scenarios, cached by network."""
+        keys = [(network_fingerprint(graph, self.simulation.N_matrix, self.simulation.T_max), n_trials)
+                for graph in graphs]
+        missing = {}
+        for key, graph in zip(keys, graphs):
+            if key not in self.cache and key not in missing:
+                missing[key] = graph
+        if missing:
+            counts = self.count(list(missing.values()), n_trials)
+            self.evaluations += len(missing)
+            for key, count in zip(missing, counts):
+                self.cache[key] = count / n_trials
+        return [self.cache[key] for key in keys]
+
+    def plan(self, max_moves=20, log=None):
+        """Return the Plan of greedy moves, stopping at the target, after max_moves or when nothing helps."""
+        graph = self.simulation.graph.copy()
+        require_uniform(graph, "capacity planning")
+        edges = {frozenset(edge) for edge in graph.edges()} | {frozenset(edge) for edge in self.candidate_links}
+        self.block = ScenarioBlock(self.n_trials, len(edges), self.p, self.seed)
+        self.block.columns(graph)
+        self.block.columns(nx.Graph(self.candidate_links))  # Same columns for every network in every plan
+        self.pool = None if self.n_workers == 1 else ProcessPoolExecutor(max_workers=self.n_workers)
+        try:
+            reliability = self.evaluate([graph], self.n_trials)[0]
+            moves = []
+            while reliability < self.target and len(moves) < max_moves:
+                candidates = self.moves(graph)
+                if not candidates:
+                    break
+                base, *surrogates = self.evaluate([graph] + [upgraded for _, upgraded in candidates],
+                                                  self.surrogate_trials)
+                ranked = sorted(range(len(candidates)),
+                                key=lambda index: -(surrogates[index] - base) / candidates[index][0].cost)
+                shortlist = [candidates[index] for index in ranked[:self.confirm]]
+                confirmed = self.evaluate([upgraded for _, upgraded in shortlist], self.n_trials)
+                gain, (move, upgraded), new_reliability = max(
+                    (((value - reliability) / candidate[0].cost, candidate, value)
+                     for candidate, value in zip(shortlist, confirmed)), key=lambda option: option[0])
+                if gain <= 0:
+                    break
+                graph, reliability = upgraded, new_reliability
+                moves.append(move)
+                if log is not None:
+                    log(f"{move.kind} {move.edge} +{move.capacity:.1f} for {move.cost:.1f}: reliability {reliability}")
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown()
+            self.block.close()
+            self.pool = self.block = None
+        return Plan(moves, sum(move.cost for move in moves), reliability, reliability >= self.target,
+                    self.evaluations)
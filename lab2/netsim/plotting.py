@@ -0,0 +1,37 @@
+"""Plots of the lab; matplotlib is only imported when one of them is drawn."""
+
+
+def draw_topology(graph):
+    """Draw the graph with the capacity of every edge as its label."""
+    import matplotlib.pyplot as plt
+    import networkx as nx
+
+    edge_labels = {(u, v): str(graph[u][v]['c']) for u, v in graph.edges()}
+    plt.figure(figsize=(12, 12))
+    pos = nx.spring_layout(graph, seed=42)  # Layout for consistent positioning
+    nx.draw(graph, pos, with_labels=True, node_color='lightblue', edge_color='gray', node_size=800, font_size=15)
+    nx.draw_networkx_edge_labels(graph, pos, edge_labels=edge_labels, font_color='red')
+    plt.title('Topologia Grafu')
+    plt.show()
+
+
+def plot_reliabilities(reliabilities_1, reliabilities_2, reliabilities_3):
+    """Plot the reliability curves of the three experiments on stacked subplots."""
+    import matplotlib.pyplot as plt
+
+    fig, axs = plt.subplots(3, 1, figsize=(8, 12))  # 3 plots, each one stacked vertically
+    curves = [
+        (reliabilities_1, 'Reliability vs N', 'blue'),
+        (reliabilities_2, 'Reliability vs Capacities', 'green'),
+        (reliabilities_3, 'Reliability vs Topology Changes', 'red'),
+    ]
+    for ax, (reliabilities, title, color) in zip(axs, curves):
+        ax.plot(reliabilities, label=title, color=color)
+        ax.set_title(title)
+        ax.set_xlabel('Step')
+        ax.set_ylabel('Reliability')
+        ax.legend()
+
+    # Adjust layout to prevent overlapping
+    plt.tight_layout()
+    plt.show()
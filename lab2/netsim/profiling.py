@@ -0,0 +1,93 @@
+"""Optional per-phase profiling of NetworkSimulation.
+
+A Profiler accumulates the wall time and the number of calls of every phase of a trial
+(copying the graph, removing edges, the connectivity check, routing, the delay check, ...)
+and counts the trials by outcome: reliable, disconnected, overloaded or too slow. The
+totals come out as a report dict or table, and with trace=True every call is also kept as
+an event of a Chrome trace (chrome://tracing or https://ui.perfetto.dev).
+
+Simulations pick up the active profiler when they are created, so inside profiled() the
+simulations run_sweep builds are covered too, as long as they run in this process
+(n_workers=1). Without a profiler a phase costs one attribute test and a shared null
+context manager.
+"""
+from contextlib import contextmanager, nullcontext
+import json
+import os
+import time
+
+active = None  # Profiler handed to every NetworkSimulation created inside profiled()
+disabled = nullcontext()
+
+
+class Profiler:
+    """Wall time and call counts per phase, trial outcome counters and optional trace events."""
+
+    def __init__(self, trace=False):
+        self.phases = {}  # Phase name -> [calls, seconds]
+        self.counters = {}
+        self.events = [] if trace else None  # (name, start, duration) in seconds since self.origin
+        self.origin = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        """Time the body of a with block as one call of a phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            totals = self.phases.setdefault(name, [0, 0.0])
+            totals[0] += 1
+            totals[1] += elapsed
+            if self.events is not None:
+                self.events.append((name, start - self.origin, elapsed))
+
+    def count(self, name, amount=1):
+        """Add amount to a counter."""
+        self.counters[name] = self.counters.get(name, 0) + int(amount)
+
+    def report(self):
+        """Return {'phases': {name: {'calls', 'seconds'}}, 'counters': {name: count}}, slowest phase first."""
+        phases = sorted(self.phases.items(), key=lambda item: -item[1][1])
+        return {'phases': {name: {'calls': calls, 'seconds': seconds} for name, (calls, seconds) in phases},
+                'counters': dict(self.counters)}
+
+    def format_report(self):
+        """Return the report as a text table."""
+        report = self.report()
+        total = sum(phase['seconds'] for phase in report['phases'].values()) or 1.0
+        lines = [f"{'phase':<16}{'calls':>10}{'seconds':>12}{'share':>8}"]
+        for name, phase in report['phases'].items():
+            lines.append(f"{name:<16}{phase['calls']:>10}{phase['seconds']:>12.4f}{phase['seconds'] / total:>8.1%}")
+        for name, value in report['counters'].items():
+            lines.append(f"{name:<16}{value:>10}")
+        return '\n'.join(lines)
+
+    def chrome_trace(self):
+        """Return the recorded events in the Chrome trace event format."""
+        events = [{'name': name, 'ph': 'X', 'ts': start * 1e6, 'dur': duration * 1e6, 'pid': os.getpid(), 'tid': 0}
+                  for name, start, duration in self.events or []]
+        end = max((start + duration for _, start, duration in self.events or []), default=0.0)
+        if self.counters:
+            events.append({'name': 'trials', 'ph': 'C', 'ts': end * 1e6, 'pid': os.getpid(), 'tid': 0,
+                           'args': dict(self.counters)})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write_chrome_trace(self, path):
+        """Write the Chrome trace to a JSON file; needs a Profiler created with trace=True."""
+        if self.events is None:
+            raise ValueError("the profiler was created without trace=True, so it has no events")
+        with open(path, 'w') as file:
+            json.dump(self.chrome_trace(), file)
+
+
+@contextmanager
+def profiled(trace=False):
+    """Make a new Profiler active for the simulations created in the with block and yield it."""
+    global active
+    previous, active = active, Profiler(trace)
+    try:
+        yield active
+    finally:
+        active = previous
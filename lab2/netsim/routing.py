@@ -0,0 +1,299 @@
+import numpy as np
+
+from .traffic import as_demands, same_traffic
+
+
+class PathIncidence:
+    """Sparse path-edge incidence matrix of a routing, stored as NumPy index arrays.
+
+    Entry k says that the path of demand rows[k] uses edge cols[k], where demands are numbered
+    like the routing's demand pairs, so the edge flows are the mat-vec A^T n of the demand
+    volumes. The entries are kept sorted by edge, which turns the product into one
+    np.add.reduceat over the gathered volumes and lets a whole stack of traffic scenarios go
+    through in a single call.
+    """
+
+    def __init__(self, rows, cols, n_demands, n_edges):
+        order = np.argsort(cols, kind='stable')
+        self.rows = rows[order]
+        self.cols = cols[order]
+        self.n_demands = n_demands
+        self.n_edges = n_edges
+        self.used_edges, self.starts = np.unique(self.cols, return_index=True)
+
+    def flows(self, volumes):
+        """Return the flow on every edge for a vector of demand volumes."""
+        return self.batch_flows(np.asarray(volumes)[np.newaxis])[0]
+
+    def batch_flows(self, volumes):
+        """Return the (scenarios x edges) flows for a (scenarios x demands) matrix of volumes."""
+        volumes = np.asarray(volumes, dtype=np.float64)
+        # Without traffic there is nothing to reshape by; the delay then comes out as nan (0 / 0)
+        volumes = volumes.reshape(-1, self.n_demands) if self.n_demands else np.atleast_2d(volumes)
+        flows = np.zeros((len(volumes), self.n_edges))
+        if len(self.cols):
+            flows[:, self.used_edges] = np.add.reduceat(volumes[:, self.rows], self.starts, axis=1)
+        return flows
+
+
+class IncrementalRouting:
+    """Shortest-path routes of the demands of the intact graph, reused for damaged copies of it.
+
+    Edges carry no 'weight', so Dijkstra is a breadth-first search that gives every node the
+    first neighbour that reached it as parent. Removing edges that are not on a source's
+    paths therefore leaves those paths unchanged, and a damaged graph only needs the routes
+    that lost an edge to be recomputed. The routes of every source (only towards the targets
+    it has traffic for) are stored as path-edge incidence entries, memoized by the removed
+    edges they depend on, so a new traffic volume only needs mat-vecs and the total flow of a
+    damaged graph is updated by the difference of the changed sources. Nothing is V x V:
+    memory grows with the edges and the demand paths. Nodes are indexed by position in
+    graph.nodes() and flows by edge in graph.edges() order of the copy the routing keeps.
+    """
+
+    max_cached_trees = 200000  # Memo entries kept before the cache is cleared
+
+    def __init__(self, graph):
+        # graph.copy() rebuilds the neighbour order, and Dijkstra breaks ties by that order, so the
+        # trees are taken from a copy to match the damaged copies made in simulate_reliability
+        graph = graph.copy()
+        self.graph = graph
+        self.nodes = list(graph.nodes())
+        node_index = {node: k for k, node in enumerate(self.nodes)}
+        self.edges = list(graph.edges())
+        self.endpoints = np.array([(node_index[u], node_index[v]) for u, v in self.edges], dtype=np.int32).reshape(-1, 2)
+        edge_ids = {}
+        for k, (u, v) in enumerate(self.edges):
+            edge_ids[u, v] = k
+            edge_ids[v, u] = k
+        # Neighbours of every node as (node index, edge id), in the order Dijkstra visits them
+        self.adjacency = [[(node_index[v], edge_ids[u, v]) for v in graph[u]] for u in self.nodes]
+        self.N_matrix = None
+        self.pair_codes = None  # Demand node pairs as source * V + target, sorted; demands are numbered by it
+        self.source_targets = {}  # Source -> (target node positions, demand numbers)
+        self.trees = {}  # (source, removed edges it depends on) -> (path edge bit mask, demand numbers, edge ids)
+        self.incidence = None
+        self.volumes = None  # Demand volumes in pair_codes order
+        self.flows = None
+        self.last_removed = None
+        self.last_flows = None
+        # Removed edge bit mask -> flows of the damaged graph for the current traffic, None if it is
+        # disconnected. Neither depends on the capacities, so capacity changes keep the entries
+        self.evaluations = {}
+
+    def shortest_path_tree(self, source, removed, targets=None):
+        """Return (visit order, parents, parent edge ids, tree edge bit mask) of a BFS from a source.
+
+        Nodes are given by index and removed is a bit mask of the edge ids to avoid. With a
+        set of targets the search stops once all of them are reached, since a node's parent
+        is final as soon as it is discovered, and the tree mask is not built (returned as 0).
+        """
+        parent = [-1] * len(self.nodes)
+        parent_edge = [-1] * len(self.nodes)
+        parent[source] = source
+        order = [source]
+        # A set of edge ids: testing bits of a large mask costs O(E) per test on big graphs
+        avoided = set()
+        while removed:
+            lowest = removed & -removed
+            avoided.add(lowest.bit_length() - 1)
+            removed ^= lowest
+        remaining = len(targets) if targets is not None else -1
+        for node in order:
+            for neighbour, edge in self.adjacency[node]:
+                if parent[neighbour] == -1 and edge not in avoided:
+                    parent[neighbour] = node
+                    parent_edge[neighbour] = edge
+                    order.append(neighbour)
+                    if targets is not None and neighbour in targets:
+                        remaining -= 1
+            if remaining == 0:
+                break
+        tree_mask = 0
+        if targets is None:
+            for node in order[1:]:
+                tree_mask |= 1 << parent_edge[node]
+        return order, parent, parent_edge, tree_mask
+
+    def source_paths(self, source, removed):
+        """Return the path edge bit mask and the (demand numbers, edge ids) incidence entries of a source."""
+        targets, demand_ids = self.source_targets[source]
+        path_edges = {source: []}
+        rows, edges = [], []
+        if len(targets) == len(self.nodes) - 1:
+            # Traffic to every other node (the lab's dense N matrix): walk the whole tree in BFS order
+            order, parent, parent_edge, path_mask = self.shortest_path_tree(source, removed)
+            demand_of = dict(zip(targets, demand_ids))
+            for node in order[1:]:
+                path = path_edges[parent[node]] + [parent_edge[node]]
+                path_edges[node] = path
+                if node in demand_of:
+                    rows.extend([demand_of[node]] * len(path))
+                    edges.extend(path)
+            return path_mask, np.array(rows, dtype=np.int64), np.array(edges, dtype=np.int64)
+        _, parent, parent_edge, _ = self.shortest_path_tree(source, removed, set(targets))
+        path_mask = 0
+        for target, demand in zip(targets, demand_ids):
+            if parent[target] == -1:
+                continue  # Unreachable in this damaged graph, so the demand puts no flow anywhere
+            climb = []
+            node = target
+            while node not in path_edges:
+                climb.append(node)
+                node = parent[node]
+            for node in reversed(climb):
+                path_edges[node] = path_edges[parent[node]] + [parent_edge[node]]
+                path_mask |= 1 << parent_edge[node]
+            rows.extend([demand] * len(path_edges[target]))
+            edges.extend(path_edges[target])
+        return path_mask, np.array(rows, dtype=np.int64), np.array(edges, dtype=np.int64)
+
+    def removed_mask(self, graph):
+        """Return the bit mask of the edges of the intact graph missing from a damaged copy."""
+        removed = 0
+        for k, (u, v) in enumerate(self.edges):
+            if not graph.has_edge(u, v):
+                removed |= 1 << k
+        return removed
+
+    def removed_masks(self, edges, survival):
+        """Return the removed edge bit mask of every row of a survival matrix whose columns follow edges."""
+        column = {}
+        for k, (u, v) in enumerate(edges):
+            column[u, v] = k
+            column[v, u] = k
+        removed = ~np.asarray(survival, dtype=bool)[:, [column[edge] for edge in self.edges]]
+        packed = np.packbits(removed, axis=1, bitorder='little')
+        return [int.from_bytes(row.tobytes(), 'little') for row in packed]
+
+    def tree(self, key):
+        """Return the (path edge bit mask, demand numbers, edge ids) memo entry of a (source, removed) key."""
+        if key not in self.trees:
+            self.trees[key] = self.source_paths(*key)
+        return self.trees[key]
+
+    def tree_key(self, source, removed, key=0):
+        """Return the memo key of a source's routes in the graph without the removed edges.
+
+        The lookup starts from the routes of key (the intact graph by default, or any subset
+        of removed) and only removes the edges that the current routes actually use, so
+        damaged graphs that differ off the routes share one memo entry.
+        """
+        path_mask = self.tree((source, key))[0]
+        while path_mask & removed & ~key:
+            key |= path_mask & removed
+            path_mask = self.tree((source, key))[0]
+        return source, key
+
+    def trim_cache(self, evaluations=True):
+        """Drop the memoized damaged routes once there are more than max_cached_trees of them.
+
+        With evaluations the evaluation cache is trimmed the same way; that only happens
+        between evaluate_survival calls, since a call reads back the entries it filled.
+        """
+        if len(self.trees) > self.max_cached_trees:
+            self.trees = {key: entry for key, entry in self.trees.items() if key[1] == 0}
+        if evaluations and len(self.evaluations) > self.max_cached_trees:
+            self.evaluations = {}
+
+    def damaged_incidence(self, removed):
+        """Return the PathIncidence of the routing in the graph without the removed edges."""
+        rows, cols = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+        for source in self.source_targets:
+            _, demand_ids, edges = self.tree(self.tree_key(source, removed))
+            rows.append(demand_ids)
+            cols.append(edges)
+        return PathIncidence(np.concatenate(rows), np.concatenate(cols), len(self.pair_codes), len(self.edges))
+
+    def covers(self, pair_codes):
+        """Tell whether the routing already has routes for all the given pair codes."""
+        return self.pair_codes is not None and bool(np.isin(pair_codes, self.pair_codes).all())
+
+    def add_pairs(self, pair_codes):
+        """Make sure the given pair codes are routed too, keeping the current pairs."""
+        if not self.covers(pair_codes):
+            current = self.pair_codes if self.pair_codes is not None else np.zeros(0, dtype=np.int64)
+            self.set_pairs(np.union1d(current, pair_codes))
+
+    def set_pairs(self, pair_codes):
+        """Route a new set of demand pairs, given as sorted source * V + target codes."""
+        self.pair_codes = pair_codes
+        self.N_matrix = None  # The volumes of the current traffic must be renumbered
+        sources, targets = np.divmod(pair_codes, len(self.nodes))
+        self.source_targets = {}
+        for source in np.unique(sources).tolist():
+            selected = np.nonzero(sources == source)[0]
+            self.source_targets[source] = (targets[selected].tolist(), selected.tolist())
+        self.trees = {}
+        self.evaluations = {}
+        self.incidence = self.damaged_incidence(0)
+
+    def node_demands(self, N_matrix):
+        """Return the volumes of a traffic matrix (or a list or stack of them) in the routing's demand order.
+
+        Pairs the routing does not know raise a ValueError; see set_pairs.
+        """
+        if not isinstance(N_matrix, list) and np.ndim(N_matrix) == 3:
+            N_matrix = list(N_matrix)
+        if isinstance(N_matrix, list):
+            return np.array([self.node_demands(matrix) for matrix in N_matrix]).reshape(len(N_matrix),
+                                                                                          len(self.pair_codes))
+        demands = as_demands(N_matrix)
+        volumes = np.zeros(len(self.pair_codes))
+        codes = demands.pair_codes()
+        index = np.searchsorted(self.pair_codes, codes)
+        known = index < len(self.pair_codes)
+        known[known] = self.pair_codes[index[known]] == codes[known]
+        if not known.all():
+            raise ValueError("traffic has node pairs the routing was not set up for")
+        np.add.at(volumes, index, demands.volumes)
+        return volumes
+
+    def set_traffic(self, N_matrix):
+        """Recompute the flows of the intact graph for a traffic matrix, routing any new pairs first."""
+        pair_codes = np.unique(as_demands(N_matrix).pair_codes())
+        if not self.covers(pair_codes):
+            self.set_pairs(pair_codes)
+        self.N_matrix = N_matrix.copy()
+        self.volumes = self.node_demands(N_matrix)
+        self.flows = self.incidence.flows(self.volumes)
+        self.last_removed = None
+        self.evaluations = {}
+
+    def use_traffic(self, N_matrix):
+        """Switch to a traffic matrix, recomputing the flows only if it changed."""
+        if self.N_matrix is None or not same_traffic(N_matrix, self.N_matrix):
+            self.set_traffic(N_matrix)
+
+    def edge_flows(self, graph, N_matrix):
+        """Return the flow on every edge of the intact graph when routing over a damaged copy.
+
+        Edges missing from the damaged graph carry no flow.
+        """
+        self.use_traffic(N_matrix)
+        removed = self.removed_mask(graph)
+        if removed == self.last_removed:
+            return self.last_flows  # calculate_T routes the same damaged graph again
+        return self.damaged_flows(removed)
+
+    def damaged_flows(self, removed):
+        """Return the flow on every edge of the intact graph without the removed edges, for the current traffic."""
+        self.trim_cache(evaluations=False)
+        old_rows, old_edges, new_rows, new_edges = [], [], [], []
+        for source in self.source_targets:
+            key = self.tree_key(source, removed)
+            if key[1]:
+                # Swap the source's intact routes for its damaged ones
+                _, rows, edges = self.tree((source, 0))
+                old_rows.append(rows)
+                old_edges.append(edges)
+                _, rows, edges = self.tree(key)
+                new_rows.append(rows)
+                new_edges.append(edges)
+        flows = self.flows.copy()
+        if old_rows:
+            n_old = sum(len(rows) for rows in old_rows)
+            weights = self.volumes[np.concatenate(old_rows + new_rows)]
+            weights[:n_old] *= -1
+            flows += np.bincount(np.concatenate(old_edges + new_edges), weights=weights, minlength=len(self.edges))
+        self.last_removed, self.last_flows = removed, flows
+        return flows
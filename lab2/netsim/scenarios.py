@@ -0,0 +1,84 @@
+"""Common random numbers: one block of failure scenarios shared by every step of a sweep.
+
+Every scenario is a row of edge survival flags, bit-packed with np.packbits so a block takes
+one bit per edge and trial. Columns belong to edges, not to positions in graph.edges(), so
+edges added by the topology experiment get columns of their own and the edges that were
+already there keep failing in exactly the same scenarios. Large blocks are written to a
+memory-mapped .npy file instead of being kept in memory.
+"""
+import os
+import tempfile
+
+import numpy as np
+
+memmap_bytes = 64 * 2 ** 20  # Blocks larger than this go to a memory-mapped file
+generate_rows = 10000  # Scenarios drawn per call while filling a block
+
+
+class ScenarioBlock:
+    """Bit-packed (trials x columns) block of edge survival flags drawn with probability p."""
+
+    def __init__(self, n_trials, n_columns, p, seed=None, path=None):
+        self.n_trials = n_trials
+        self.n_columns = n_columns
+        self.column_of = {}  # frozenset({u, v}) -> column, assigned in order of first use
+        shape = (n_trials, (n_columns + 7) // 8)
+        self.owned_path = None
+        if path is None and shape[0] * shape[1] > memmap_bytes:
+            descriptor, path = tempfile.mkstemp(suffix='.npy')
+            os.close(descriptor)
+            self.owned_path = path
+        self.path = path
+        if path is None:
+            self.packed = np.empty(shape, dtype=np.uint8)
+        else:
+            self.packed = np.lib.format.open_memmap(path, mode='w+', dtype=np.uint8, shape=shape)
+        rng = np.random.default_rng(seed)
+        for start in range(0, n_trials, generate_rows):
+            stop = min(start + generate_rows, n_trials)
+            # Same convention as draw_survival_mask: an edge survives when its draw is at most p
+            self.packed[start:stop] = np.packbits(rng.random((stop - start, n_columns)) <= p, axis=1)
+
+    def columns(self, graph):
+        """Return the block columns of the graph's edges in graph.edges() order."""
+        columns = []
+        for u, v in graph.edges():
+            key = frozenset((u, v))
+            if key not in self.column_of:
+                if len(self.column_of) == self.n_columns:
+                    raise ValueError(f"scenario block has only {self.n_columns} edge columns")
+                self.column_of[key] = len(self.column_of)
+            columns.append(self.column_of[key])
+        return columns
+
+    def rows(self, start, stop):
+        """Return scenarios start..stop for a worker, see load_rows.
+
+        That is a packed copy of the rows, or (path, start, stop) when the block is
+        memory-mapped, so the workers read their rows from the file themselves.
+        """
+        if self.path is None:
+            return np.array(self.packed[start:stop])
+        self.packed.flush()
+        return self.path, start, stop
+
+    def close(self):
+        """Release the block and delete its file if the block created one."""
+        self.packed = None
+        self.path = None
+        if self.owned_path is not None:
+            os.remove(self.owned_path)
+            self.owned_path = None
+
+
+def load_rows(rows):
+    """Return the packed scenario rows described by ScenarioBlock.rows."""
+    if isinstance(rows, tuple):
+        path, start, stop = rows
+        return np.load(path, mmap_mode='r')[start:stop]
+    return rows
+
+
+def unpack_survival(packed, n_columns, columns):
+    """Return the (trials x len(columns)) survival matrix of some packed scenario rows."""
+    return np.unpackbits(packed, axis=1, count=n_columns).astype(bool)[:, columns]
@@ -0,0 +1,396 @@
+import random
+
+import networkx as nx
+import numpy as np
+
+from . import exact, failures, profiling, sensitivity, stopping
+from .estimators import estimators
+from .routing import IncrementalRouting
+from .traffic import Demands, as_demands, random_demands, total_traffic, use_dense_traffic
+
+# Default parameters
+m = 1500  # Average packet size in bits
+T_max = 0.1  # Maximum acceptable average packet delay
+initial_p = 0.9 # Probability that an edge is not damaged
+trials = 100 # Number of trials for the simulation
+steps = 10 # Number of steps for modifying network parameters
+
+
+def bulk_is_connected(endpoints, survival, n_nodes):
+    """Check connectivity of every trial at once with a union-find vectorized over trials.
+
+    endpoints is an (E, 2) array of node indices and survival a (trials x E) boolean matrix.
+    Every node keeps a parent label; surviving edges hook the labels of their endpoints to the
+    smaller one and pointer jumping compresses the paths until nothing changes.
+    """
+    n_trials = survival.shape[0]
+    labels = np.tile(np.arange(n_nodes), (n_trials, 1))
+    rows, cols = np.nonzero(survival)
+    u, v = endpoints[cols, 0], endpoints[cols, 1]
+    while True:
+        previous = labels.copy()
+        lu, lv = labels[rows, u], labels[rows, v]
+        low = np.minimum(lu, lv)
+        np.minimum.at(labels, (rows, lu), low)
+        np.minimum.at(labels, (rows, lv), low)
+        labels = np.take_along_axis(labels, labels, axis=1)
+        if np.array_equal(labels, previous):
+            break
+    return np.all(labels == labels[:, :1], axis=1)
+
+
+missing_entry = object()  # Marks the states evaluate_survival has not found in the evaluation cache
+
+
+class NetworkSimulation:
+    def __init__(self, graph, T_max=T_max, trials=trials):
+        """Initialize the network simulation with a given graph and traffic intensity matrix."""
+        self.graph = graph  # Network topology, any hashable node labels
+        self.nodes = list(graph.nodes())  # Traffic and routing index nodes by position in this list
+        self.V = graph.number_of_nodes()
+        self.T_max = T_max  # Maximum acceptable average packet delay
+        self.trials = trials  # Number of trials for the simulation
+        if use_dense_traffic(self.V):
+            self.N_matrix = np.zeros((self.V, self.V), dtype=int)   # Traffic intensity matrix
+        else:
+            self.N_matrix = Demands([], [], np.zeros(0, dtype=int), self.V)  # Sparse traffic, see netsim.traffic
+        self.a_values = np.zeros(graph.number_of_edges())  # Flow on each edge, in edge_arrays() order
+        self.routing = None  # Cached shortest-path trees of self.graph, see IncrementalRouting
+        self.capacities = None  # Cached capacities in edge_arrays() order, None when they must be reread
+        self.profiler = profiling.active  # Per-phase timings and trial counters, None when disabled
+
+    def populate_N_matrix(self, n_pairs=None):
+        """Populate the N matrix with random values for existing edges only.
+
+        Networks too large for all-pairs traffic (see netsim.traffic.use_dense_traffic), or any
+        network when n_pairs is given, get sparse Demands between n_pairs random node pairs
+        instead, V pairs by default.
+        """
+        if n_pairs is not None or not use_dense_traffic(self.V):
+            self.N_matrix = random_demands(self.V, self.V if n_pairs is None else n_pairs)
+            return
+        for u in range(self.V):
+            for v in range(u + 1, self.V):  # Start from u+1 to avoid self-loops and redundant calculations
+                    traffic = random.randint(1, 10)  # Random traffic for this pair
+                    self.N_matrix[u][v] = traffic  # Assign traffic from u to v
+                    self.N_matrix[v][u] = traffic  # Mirror for v to u since it's undirected
+
+
+    def compute_a_values(self,graph):
+        """Compute flow values (a_values) for each edge based on shortest paths."""
+        # One flow per edge of self.graph in edge_arrays() order; removed edges carry none
+        with self.phase('routing'):
+            self.a_values = self.get_routing().edge_flows(graph, self.N_matrix).copy()
+
+    def enable_profiling(self, trace=False):
+        """Start collecting per-phase timings and trial counters and return the Profiler, see netsim.profiling."""
+        self.profiler = profiling.Profiler(trace)
+        return self.profiler
+
+    def phase(self, name):
+        """Return a context manager that times a phase when profiling is enabled."""
+        return self.profiler.phase(name) if self.profiler is not None else profiling.disabled
+
+    def record_outcomes(self, connected, overloaded, fast, multiplicity=1):
+        """Count trials as disconnected, overloaded, too slow or reliable when profiling is enabled.
+
+        The arguments are flags of one trial or arrays over distinct states, with multiplicity
+        the number of trials in each.
+        """
+        if self.profiler is None:
+            return
+        connected, overloaded, fast = (np.atleast_1d(flags) for flags in (connected, overloaded, fast))
+        weights = np.broadcast_to(multiplicity, connected.shape)
+        self.profiler.count('trials', weights.sum())
+        self.profiler.count('disconnected', weights[~connected].sum())
+        self.profiler.count('overloaded', weights[connected & overloaded].sum())
+        self.profiler.count('too_slow', weights[connected & ~overloaded & ~fast].sum())
+        self.profiler.count('reliable', weights[connected & ~overloaded & fast].sum())
+
+    def get_routing(self):
+        """Return the cached IncrementalRouting of self.graph, building it on first use."""
+        if self.routing is None:
+            self.routing = IncrementalRouting(self.graph)
+        return self.routing
+
+    def flows_for_traffic(self, N_matrices, graph=None):
+        """Return the (scenarios x edges) flows of a stack or list of traffic matrices routed over graph.
+
+        The routing is computed once and shared by all scenarios; graph defaults to self.graph
+        and the edges are in edge_arrays() order.
+        """
+        routing = self.get_routing()
+        graph = self.graph if graph is None else graph
+        routing.add_pairs(np.concatenate([as_demands(N).pair_codes() for N in N_matrices]))
+        incidence = routing.damaged_incidence(routing.removed_mask(graph))
+        return incidence.batch_flows(routing.node_demands(N_matrices))
+
+    def simulate_reliability(self, p, m):
+        """Simulate the reliability of the network over multiple trials."""
+        count_reliable = 0
+        self.edge_arrays(refresh=True)  # is_reliable reads the cached capacities
+        for _ in range(self.trials):
+            with self.phase('copy'):
+                damaged_graph = self.graph.copy()
+            with self.phase('remove_edges'):
+                self.randomly_remove_edges(damaged_graph, p)
+            with self.phase('connectivity'):
+                connected = nx.is_connected(damaged_graph)
+            if not connected:
+                self.record_outcomes(False, False, False)
+            elif self.is_reliable(damaged_graph, m):
+                count_reliable += 1
+
+        return count_reliable / self.trials
+
+    def is_reliable(self, damaged_graph, m):
+        """Check that a connected damaged graph is neither overloaded nor too slow."""
+        with self.phase('routing'):
+            flows = self.get_routing().edge_flows(damaged_graph, self.N_matrix)
+        with self.phase('delay'):
+            _, capacities = self.edge_arrays()
+            overloaded, fast = self.flow_outcomes(flows, capacities, m)
+        self.record_outcomes(True, overloaded, fast)
+        return bool(~overloaded & fast)
+
+    def simulate_reliability_batched(self, p, m, n_trials=None, rng=None):
+        """Simulate the reliability of the network with all trials drawn and checked in bulk.
+
+        With rng=None the edge states are drawn from the `random` module in the same order as
+        simulate_reliability, so both give the same estimate for the same random.seed().
+        Passing a numpy Generator draws the whole (trials x edges) matrix in one call instead.
+        """
+        n_trials = self.trials if n_trials is None else n_trials
+        return self.count_reliable(p, m, n_trials, rng) / n_trials
+
+    def simulate_reliability_adaptive(self, p, m, rule, rng=None):
+        """Run batched trials until the confidence interval meets a StoppingRule, see netsim.stopping.
+
+        The first batch has self.trials trials. Returns an AdaptiveEstimate with the estimate,
+        the interval and the number of trials used.
+        """
+        stopping.check_rule(rule)
+        reliable = n_trials = 0
+        batch = min(self.trials, rule.max_trials)
+        while batch > 0:
+            reliable += self.count_reliable(p, m, batch, rng)
+            n_trials += batch
+            current = stopping.estimate(rule, reliable, n_trials)
+            batch = stopping.next_batch(rule, current, self.trials)
+        return current
+
+    def count_reliable(self, p, m, n_trials, rng=None):
+        """Return how many of n_trials batched trials leave the network reliable."""
+        with self.phase('draw'):
+            survival = self.draw_survival_mask(n_trials, self.graph.number_of_edges(), p, rng)
+        return int(np.count_nonzero(self.evaluate_survival(survival, m)))
+
+    def evaluate_survival(self, survival, m, connected=None):
+        """Return which rows of a (trials x edges) survival matrix leave the network reliable.
+
+        Columns follow self.graph.edges() order. connected can pass the connectivity of the
+        rows when it is already known, e.g. from a previous step with the same topology.
+        Trials with the same surviving edges have the same outcome, so every distinct set is
+        evaluated once, and its connectivity and flows are kept in the routing's evaluation
+        cache: after a capacity change only the overload and delay checks run again.
+        """
+        edges, endpoints = self.edge_index_arrays(self.graph)
+        routing = self.get_routing()
+        with self.phase('routing'):
+            routing.use_traffic(self.N_matrix)
+            routing.trim_cache()  # Between calls only: the entries of this call are read back below
+        with self.phase('dedup'):
+            unique_masks, first, inverse = np.unique(survival, axis=0, return_index=True, return_inverse=True)
+            removed = routing.removed_masks(edges, unique_masks)
+            unique_flows = [routing.evaluations.get(mask, missing_entry) for mask in removed]
+            missing = [k for k, entry in enumerate(unique_flows) if entry is missing_entry]
+        if missing:
+            with self.phase('connectivity'):
+                if connected is None:
+                    missing_connected = bulk_is_connected(endpoints, unique_masks[missing], self.graph.number_of_nodes())
+                else:
+                    missing_connected = connected[first[missing]]
+            with self.phase('routing'):
+                for k, is_connected in zip(missing, missing_connected):
+                    unique_flows[k] = routing.damaged_flows(removed[k]) if is_connected else None
+                    routing.evaluations[removed[k]] = unique_flows[k]
+        with self.phase('delay'):
+            flows = np.zeros((len(removed), len(routing.edges)))
+            unique_connected = np.zeros(len(removed), dtype=bool)
+            for k, entry in enumerate(unique_flows):
+                if entry is not None:
+                    flows[k] = entry
+                    unique_connected[k] = True
+            _, capacities = self.edge_arrays(refresh=True)
+            overloaded, fast = self.flow_outcomes(flows, capacities, m)
+        inverse = inverse.reshape(-1)
+        if self.profiler is not None:
+            self.record_outcomes(unique_connected, overloaded, fast, np.bincount(inverse, minlength=len(removed)))
+        outcomes = unique_connected & ~overloaded & fast
+        return outcomes[inverse]
+
+    def edge_arrays(self, refresh=False):
+        """Return the edges as an int32 (E, 2) array of node indices and their float64 capacities.
+
+        Both follow the edge order of the routing's flows, so the overload check and the delay
+        are vector expressions over three parallel arrays instead of graph[i][j]['c'] lookups.
+        The capacities are cached; refresh=True reads them from the graph again, which
+        evaluate_survival, simulate_reliability, calculate_T and exact mode do once per call,
+        so a direct change of a 'c' attribute of self.graph is seen by the next call.
+        """
+        routing = self.get_routing()
+        if refresh or self.capacities is None or len(self.capacities) != len(routing.edges):
+            self.capacities = np.fromiter((self.graph[u][v]['c'] for u, v in routing.edges), dtype=np.float64,
+                                          count=len(routing.edges))
+        return routing.endpoints, self.capacities
+
+    def check_flows(self, flows, capacities, m):
+        """Return which rows of a (trials x edges) flow matrix overload no edge and keep T below T_max.
+
+        A single flow vector gives a single answer. Removed edges carry no flow, so they never
+        count as overloaded and add nothing to the delay.
+        """
+        overloaded, fast = self.flow_outcomes(flows, capacities, m)
+        return ~overloaded & fast
+
+    def flow_outcomes(self, flows, capacities, m):
+        """Return (overloaded, fast): whether some edge is overloaded and whether T < T_max, per row."""
+        overloaded = np.any(2 * flows * m > capacities, axis=-1)
+        return overloaded, self.delay(flows, capacities, m) < self.T_max
+
+    def delay(self, flows, capacities, m):
+        """Return the average packet delay T for a flow vector or a (trials x edges) flow matrix.
+
+        T is infinite when some edge gets at least as many packets as it can carry.
+        """
+        a = 2 * np.asarray(flows, dtype=np.float64)
+        slack = capacities / m - a
+        saturated = np.any(slack <= 0, axis=-1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            T = np.sum(a / slack, axis=-1) / total_traffic(self.N_matrix)
+        return np.where(saturated, np.inf, T)
+
+    def estimate_reliability(self, p, m, n_trials=None, method='crude', rng=None, **options):
+        """Estimate the reliability with one of the estimators in netsim.estimators.
+
+        method is 'crude', 'stratified', 'importance' or 'conditional'; options go to the
+        estimator. Returns a ReliabilityEstimate with the variance and effective sample count.
+        """
+        if method not in estimators:
+            raise ValueError(f"Unknown estimator: {method}")
+        if method != 'crude':
+            failures.require_uniform(self.graph, f"the {method} estimator")
+        n_trials = self.trials if n_trials is None else n_trials
+        rng = np.random.default_rng() if rng is None else rng
+        return estimators[method](self, p, m, n_trials, rng, **options)
+
+    def exact_reliability(self, p, m):
+        """Return the reliability from every damaged state, see netsim.exact.
+
+        Meant as ground truth for the Monte Carlo estimators on small topologies; on the lab
+        topology it takes about a quarter of an hour.
+        """
+        failures.require_uniform(self.graph, "exact reliability")
+        return exact.exact_reliability(self, p, m)
+
+    def reliability_bounds(self, p, m, tolerance=1e-6, max_states=20000, max_width=0.01):
+        """Return bounds on the reliability from the most probable damaged states, see netsim.exact."""
+        failures.require_uniform(self.graph, "reliability bounds")
+        return exact.reliability_bounds(self, p, m, tolerance, max_states, max_width)
+
+    def edge_importance(self, p, m, n_trials=None, rng=None):
+        """Rank the edges by Birnbaum importance, estimated from one batched pass, see netsim.sensitivity."""
+        n_trials = self.trials if n_trials is None else n_trials
+        rng = np.random.default_rng() if rng is None else rng
+        return sensitivity.edge_importance(self, p, m, n_trials, rng)
+
+    def draw_survival_mask(self, n_trials, n_edges, probability, rng=None):
+        """Draw a (trials x edges) boolean matrix telling which edges survive in each trial.
+
+        Per-edge probabilities and risk groups of the graph are applied, see netsim.failures;
+        each trial then takes one extra draw per group after those of the edges.
+        """
+        n_draws = n_edges + failures.group_count(self.graph)
+        if rng is None:
+            draws = np.array([random.random() for _ in range(n_trials * n_draws)])
+            draws = draws.reshape(n_trials, n_draws)
+        else:
+            draws = rng.random((n_trials, n_draws))
+        # randomly_remove_edges removes an edge when the draw is above p
+        return failures.survival_from_draws(self.graph, draws, probability)
+
+    def damaged_copy(self, edges, survival):
+        """Copy the graph and remove the edges whose survival flag is False."""
+        damaged_graph = self.graph.copy()
+        damaged_graph.remove_edges_from(edge for edge, alive in zip(edges, survival) if not alive)
+        return damaged_graph
+
+    @staticmethod
+    def edge_index_arrays(graph):
+        """Return the edge list of the graph and an (E, 2) array of its endpoints as node indices."""
+        node_index = {node: k for k, node in enumerate(graph.nodes())}
+        edges = list(graph.edges())
+        endpoints = np.array([(node_index[u], node_index[v]) for u, v in edges], dtype=np.int32)
+        return edges, endpoints.reshape(-1, 2)
+
+    def randomly_remove_edges(self, graph, probability):
+        """Randomly remove edges from the graph based on a given probability."""
+        if not failures.is_uniform(graph):
+            edges = list(graph.edges())
+            draws = np.array([[random.random() for _ in range(len(edges) + failures.group_count(graph))]])
+            survival = failures.survival_from_draws(graph, draws, probability)[0]
+            graph.remove_edges_from(edge for edge, alive in zip(edges, survival) if not alive)
+            return
+        for (i, j) in list(graph.edges()):
+            random_ri = random.random()
+            if random_ri > probability:
+                graph.remove_edge(i, j)
+
+
+    def calculate_T(self,graph, m):
+        """Calculate the average packet delay T across the network."""
+        with self.phase('routing'):
+            flows = self.get_routing().edge_flows(graph, self.N_matrix)
+        with self.phase('delay'):
+            _, capacities = self.edge_arrays(refresh=True)
+            return float(self.delay(flows, capacities, m))
+
+    def increase_N_values(self, increment):
+        """Incrementally increase the values in the traffic matrix."""
+        volumes = self.N_matrix.volumes if isinstance(self.N_matrix, Demands) else self.N_matrix
+        non_zero_mask = volumes != 0
+        volumes[non_zero_mask] += increment
+
+    def increase_capacities(self, percentage_increment):
+        """Incrementally increase the capacities of all edges in the graph."""
+        for (i, j) in self.graph.edges():
+            increment_amount = self.graph[i][j]['c'] * percentage_increment / 100
+            self.graph[i][j]['c'] += increment_amount
+        self.capacities = None
+
+    def add_random_edges(self, additional_edges_count, mean_capacity, rng=None):
+        """Add new edges with average capacities to modify the network topology."""
+        added_edges = 0
+        while added_edges < additional_edges_count:
+            if rng is None:
+                i, j = np.random.randint(0, self.V, size=2)
+            else:
+                i, j = rng.integers(0, self.V, size=2)
+            i, j = self.nodes[i], self.nodes[j]
+            if i != j and not self.graph.has_edge(i, j):
+                self.graph.add_edge(i, j, c=mean_capacity)
+                added_edges += 1
+        self.routing = None  # The cached shortest-path trees belong to the old topology
+        self.capacities = None
+
+    def reset_capacities(self, initial_capacities):
+        """Reset the capacities of all edges to their initial values."""
+        for (u, v), capacity in initial_capacities.items():
+            self.graph[u][v]['c'] = capacity
+        self.capacities = None
+
+    def average_capacity(self):
+        """Calculate the average capacity of all the edges in the graph."""
+        total_capacity = sum(self.graph[u][v]['c'] for u, v in self.graph.edges())
+        num_edges = self.graph.number_of_edges()
+        return total_capacity / num_edges if num_edges > 0 else 0
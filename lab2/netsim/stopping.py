@@ -0,0 +1,134 @@
+"""Adaptive stopping: run trials until a binomial confidence interval is narrow enough.
+
+A StoppingRule gives a target half-width and/or relative error (half-width over the
+estimate) of a Wilson or Clopper-Pearson interval. A relative error can never be met with
+no successes at all, so then an upper bound below relative_error meets it instead. Trials
+are run in batches; after every batch the interval is checked, and the next batch is sized
+from the normal approximation of the trials still needed, at least a minimum batch and at
+most as many as were run so far.
+"""
+from collections import namedtuple
+import math
+from statistics import NormalDist
+
+StoppingRule = namedtuple('StoppingRule', ['half_width', 'relative_error', 'confidence', 'interval', 'max_trials'],
+                          defaults=(None, None, 0.95, 'wilson', 1000000))
+AdaptiveEstimate = namedtuple('AdaptiveEstimate', ['reliability', 'lower', 'upper', 'n_trials'])
+
+
+def wilson_interval(successes, n_trials, confidence=0.95):
+    """Return the Wilson score interval of a binomial proportion."""
+    if n_trials == 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    ratio = successes / n_trials
+    denominator = 1 + z * z / n_trials
+    centre = (ratio + z * z / (2 * n_trials)) / denominator
+    spread = z * math.sqrt(ratio * (1 - ratio) / n_trials + z * z / (4 * n_trials * n_trials)) / denominator
+    lower = max(0.0, centre - spread) if successes > 0 else 0.0
+    upper = min(1.0, centre + spread) if successes < n_trials else 1.0
+    return lower, upper
+
+
+def beta_fraction(a, b, x):
+    """Continued fraction of the incomplete beta function, evaluated with Lentz's method."""
+    tiny = 1e-300
+    c, d = 1.0, 1 - (a + b) * x / (a + 1)
+    d = 1 / (d if abs(d) > tiny else tiny)
+    result = d
+    for k in range(1, 10000):
+        for numerator in (k * (b - k) * x / ((a + 2 * k - 1) * (a + 2 * k)),
+                          -(a + k) * (a + b + k) * x / ((a + 2 * k) * (a + 2 * k + 1))):
+            d = 1 + numerator * d
+            d = 1 / (d if abs(d) > tiny else tiny)
+            c = 1 + numerator / c
+            c = c if abs(c) > tiny else tiny
+            result *= c * d
+        if abs(c * d - 1) < 1e-15:
+            break
+    return result
+
+
+def beta_cdf(x, a, b):
+    """Return the regularized incomplete beta function I_x(a, b), the Beta(a, b) CDF at x."""
+    if x <= 0:
+        return 0.0
+    if x >= 1:
+        return 1.0
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log1p(-x))
+    if x < (a + 1) / (a + b + 2):
+        return front * beta_fraction(a, b, x) / a
+    return 1 - front * beta_fraction(b, a, 1 - x) / b
+
+
+def beta_quantile(probability, a, b):
+    """Return the x with I_x(a, b) = probability, by bisection."""
+    low, high = 0.0, 1.0
+    for _ in range(100):
+        middle = (low + high) / 2
+        if beta_cdf(middle, a, b) < probability:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
+
+
+def clopper_pearson_interval(successes, n_trials, confidence=0.95):
+    """Return the exact Clopper-Pearson interval of a binomial proportion, from Beta quantiles."""
+    if n_trials == 0:
+        return 0.0, 1.0
+    alpha = 1 - confidence
+    lower = beta_quantile(alpha / 2, successes, n_trials - successes + 1) if successes > 0 else 0.0
+    upper = beta_quantile(1 - alpha / 2, successes + 1, n_trials - successes) if successes < n_trials else 1.0
+    return lower, upper
+
+
+intervals = {
+    'wilson': wilson_interval,
+    'clopper-pearson': clopper_pearson_interval,
+}
+
+
+def check_rule(rule):
+    """Raise a ValueError for a stopping rule that could never be checked."""
+    if rule.interval not in intervals:
+        raise ValueError(f"Unknown interval: {rule.interval}")
+    if rule.half_width is None and rule.relative_error is None:
+        raise ValueError("a stopping rule needs a half_width or a relative_error")
+
+
+def estimate(rule, successes, n_trials):
+    """Return the AdaptiveEstimate of successes out of n_trials under the rule's interval."""
+    lower, upper = intervals[rule.interval](successes, n_trials, rule.confidence)
+    return AdaptiveEstimate(successes / n_trials if n_trials else 0.0, lower, upper, n_trials)
+
+
+def is_precise(rule, current):
+    """Tell whether an AdaptiveEstimate meets every target of the rule."""
+    half_width = (current.upper - current.lower) / 2
+    if rule.half_width is not None and half_width > rule.half_width:
+        return False
+    if rule.relative_error is not None:
+        # A relative error can never be met with no successes, so an upper bound below
+        # relative_error stands in for it: the reliability is zero to within that
+        if current.reliability == 0:
+            return current.upper <= rule.relative_error
+        if half_width > rule.relative_error * current.reliability:
+            return False
+    return True
+
+
+def next_batch(rule, current, minimum):
+    """Return how many more trials to run, or 0 when the estimate is precise or the budget is used."""
+    if is_precise(rule, current) or current.n_trials >= rule.max_trials:
+        return 0
+    z = NormalDist().inv_cdf(0.5 + rule.confidence / 2)
+    smoothed = (current.reliability * current.n_trials + 1) / (current.n_trials + 2)
+    targets = []
+    if rule.half_width is not None:
+        targets.append(rule.half_width)
+    if rule.relative_error is not None:
+        targets.append(rule.relative_error * smoothed)
+    needed = math.ceil(z * z * smoothed * (1 - smoothed) / min(targets) ** 2)
+    batch = min(max(needed - current.n_trials, minimum), max(current.n_trials, minimum))
+    return min(batch, rule.max_trials - current.n_trials)
@@ -0,0 +1,251 @@
+"""Append-only JSON Lines store of sweep results, so long sweeps can be resumed.
+
+Every line of a store file is one JSON record:
+    {"record": "run", "run": ID, "experiment": ..., "params": {...}, "fingerprint": ..., "entropy": ...}
+    {"record": "step", "run": ID, "step": K, "reliability": ..., "seed": {"entropy": ..., "spawn_key": [...]}}
+    {"record": "done", "run": ID}
+    {"record": "session", "session": ID, "params": {...}, "fingerprint": ...}
+    {"record": "done", "session": ID}
+    {"record": "command", "command": ID, "params": {...}, "seed": ...}
+    {"record": "done", "command": ID}
+A run record holds the sweep parameters, a hash of the network the sweep started from and
+the entropy of its SeedSequence; a step record is appended and synced to disk as soon as a
+step is finished, together with the spawn key of its random stream. Adaptive steps also
+keep their interval and trial count. A sweep that matches an unfinished run resumes it
+with the same entropy, so the missing steps get the same random streams as in one go.
+A session groups the sweeps of one run_experiments call: its runs carry its id, and a
+resumed session reuses its finished runs too, so only the interrupted sweep and the ones
+after it run again, with or without a fixed seed. A command record keeps the seed that
+`python -m netsim --store` drew when it was started without --seed, so a restart builds the
+same starting network and finds its session again.
+
+Records are only ever appended, several runs can share a file, and the readers go line by
+line, so files of many runs can be scanned without loading them whole. A line cut short by
+a crash is skipped.
+"""
+import glob
+import hashlib
+import json
+import os
+import uuid
+
+import numpy as np
+
+from . import stopping
+from .traffic import as_demands
+
+
+def network_fingerprint(graph, N_matrix, T_max):
+    """Return a hash of a network's nodes, edges, capacities, traffic and T_max."""
+    digest = hashlib.sha256()
+    digest.update(repr([repr(node) for node in graph.nodes()]).encode())
+    digest.update(repr([(repr(u), repr(v), float(data['c'])) for u, v, data in graph.edges(data=True)]).encode())
+    demands = as_demands(N_matrix)
+    for array in (demands.sources, demands.targets, demands.volumes.astype(float)):
+        digest.update(array.tobytes())
+    digest.update(repr(float(T_max)).encode())
+    return digest.hexdigest()
+
+
+def fingerprint(simulation):
+    """Return the network_fingerprint of a simulation's current network."""
+    return network_fingerprint(simulation.graph, simulation.N_matrix, simulation.T_max)
+
+
+def encode_result(reliability):
+    """Return the JSON fields of a sweep step result, a float or an AdaptiveEstimate."""
+    if isinstance(reliability, stopping.AdaptiveEstimate):
+        return {'reliability': float(reliability.reliability), 'lower': float(reliability.lower),
+                'upper': float(reliability.upper), 'n_trials': int(reliability.n_trials)}
+    return {'reliability': float(reliability)}
+
+
+def decode_result(record):
+    """Return the result of a step record, an AdaptiveEstimate when it has an interval."""
+    if 'lower' in record:
+        return stopping.AdaptiveEstimate(record['reliability'], record['lower'], record['upper'], record['n_trials'])
+    return record['reliability']
+
+
+def store_paths(paths):
+    """Expand a path, a glob pattern or a list of them into store file paths."""
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]
+    expanded = []
+    for path in paths:
+        matches = sorted(glob.glob(os.fspath(path)))
+        expanded.extend(matches or [os.fspath(path)])
+    return expanded
+
+
+def iter_records(paths, record=None):
+    """Yield the records of one or more store files lazily, optionally only those of one kind."""
+    for path in store_paths(paths):
+        if not os.path.exists(path):
+            continue
+        with open(path) as file:
+            for line in file:
+                try:
+                    item = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Written only partly before a crash
+                if record is None or item.get('record') == record:
+                    yield item
+
+
+def iter_steps(paths, experiment=None):
+    """Yield every step record lazily, merged with the experiment and params of its run.
+
+    Only the run records are kept in memory, since a run record always comes before its steps.
+    """
+    runs = {}
+    for item in iter_records(paths):
+        if item.get('record') == 'run':
+            runs[item['run']] = item
+        elif item.get('record') == 'step' and item['run'] in runs:
+            run = runs[item['run']]
+            if experiment is None or run['experiment'] == experiment:
+                yield {**item, 'experiment': run['experiment'], 'params': run['params'],
+                       'result': decode_result(item)}
+
+
+class SweepRun:
+    """One sweep in a ResultStore: its id, seed entropy and the results recorded so far."""
+
+    def __init__(self, store, run_id, entropy, results=None, finished=False):
+        self.store = store
+        self.run_id = run_id
+        self.entropy = entropy
+        self.results = results or {}  # Step -> float or AdaptiveEstimate
+        self.finished = finished
+
+    def record(self, step, reliability, seed_sequence=None):
+        """Append the result of a finished step and the spawn key of its random stream."""
+        item = {'record': 'step', 'run': self.run_id, 'step': step, **encode_result(reliability)}
+        if seed_sequence is not None:
+            item['seed'] = {'entropy': seed_sequence.entropy, 'spawn_key': list(seed_sequence.spawn_key)}
+        self.store.append(item)
+        self.results[step] = reliability
+
+    def finish(self):
+        """Mark the run complete, so later sweeps without a fixed seed start a new one."""
+        if not self.finished:
+            self.store.append({'record': 'done', 'run': self.run_id})
+            self.finished = True
+
+
+class ResultStore:
+    """An append-only JSON Lines file of sweep runs and their step results."""
+
+    def __init__(self, path):
+        self.path = os.fspath(path)
+        self.checked = False
+
+    def records(self, record=None):
+        return iter_records(self.path, record)
+
+    def append(self, item):
+        """Append one record and make sure it reached the disk."""
+        with open(self.path, 'a') as file:
+            if not self.checked:
+                self.checked = True
+                if file.tell() > 0 and not self.ends_with_newline():
+                    file.write('\n')  # Close a line cut short by a crash
+            file.write(json.dumps(item) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+
+    def ends_with_newline(self):
+        with open(self.path, 'rb') as file:
+            file.seek(-1, os.SEEK_END)
+            return file.read(1) == b'\n'
+
+    def find_run(self, experiment, params, network, reuse_finished=False, session=None):
+        """Return the latest matching run as a SweepRun, or None.
+
+        A run matches when it had the same experiment, parameters and starting network;
+        finished runs only match with reuse_finished or when they belong to the given session.
+        """
+        found = None
+        found_session = None
+        for item in self.records():
+            kind = item.get('record')
+            if kind == 'run':
+                if (item['experiment'] == experiment and item['params'] == params
+                        and item['fingerprint'] == network):
+                    found = SweepRun(self, item['run'], item['entropy'])
+                    found_session = item.get('session')
+            elif found is None or item.get('run') != found.run_id:
+                continue
+            elif kind == 'step':
+                found.results[item['step']] = decode_result(item)
+            elif kind == 'done':
+                found.finished = True
+        if found is not None and found.finished and not reuse_finished:
+            if session is None or found_session != session:
+                return None
+        return found
+
+    def open_run(self, simulation, experiment, params, entropy, reuse_finished=False, session=None):
+        """Resume the matching run of a sweep, or record a new one with the given seed entropy.
+
+        Call it before the sweep changes the simulation, since the network is part of the match.
+        A new run is recorded as part of the session, if one is given.
+        """
+        params = json.loads(json.dumps(params))  # Compare the way it will be read back
+        network = fingerprint(simulation)
+        run = self.find_run(experiment, params, network, reuse_finished, session)
+        if run is None:
+            run = SweepRun(self, uuid.uuid4().hex, entropy)
+            item = {'record': 'run', 'run': run.run_id, 'experiment': experiment, 'params': params,
+                    'fingerprint': network, 'entropy': entropy}
+            if session is not None:
+                item['session'] = session
+            self.append(item)
+        return run
+
+    def open_session(self, simulation, params):
+        """Return the id of the latest unfinished session with these parameters and starting network.
+
+        A new session is recorded when there is none, so an interrupted run_experiments call
+        picks up its own sweeps again.
+        """
+        params = json.loads(json.dumps(params))
+        network = fingerprint(simulation)
+        found = None
+        for item in self.records():
+            if item.get('record') == 'session':
+                if item['params'] == params and item['fingerprint'] == network:
+                    found = item['session']
+            elif item.get('record') == 'done' and found is not None and item.get('session') == found:
+                found = None
+        if found is None:
+            found = uuid.uuid4().hex
+            self.append({'record': 'session', 'session': found, 'params': params, 'fingerprint': network})
+        return found
+
+    def finish_session(self, session):
+        """Mark a session complete, so the next call with the same parameters starts a new one."""
+        self.append({'record': 'done', 'session': session})
+
+    def open_command(self, params):
+        """Return (id, seed) of the latest unfinished command-line call with these parameters.
+
+        A new command is recorded with a fresh seed when there is none.
+        """
+        params = json.loads(json.dumps(params))
+        found = None
+        for item in self.records():
+            if item.get('record') == 'command':
+                if item['params'] == params:
+                    found = item['command'], item['seed']
+            elif item.get('record') == 'done' and found is not None and item.get('command') == found[0]:
+                found = None
+        if found is None:
+            found = uuid.uuid4().hex, np.random.SeedSequence().entropy
+            self.append({'record': 'command', 'command': found[0], 'params': params, 'seed': found[1]})
+        return found
+
+    def finish_command(self, command):
+        """Mark a command-line call complete, so the next one draws a new seed."""
+        self.append({'record': 'done', 'command': command})
@@ -0,0 +1,283 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from . import failures, stopping
+from .scenarios import ScenarioBlock, load_rows, unpack_survival
+from .simulation import NetworkSimulation, bulk_is_connected
+
+chunk_trials = 1000  # Trials per parallel task; fixed so results do not depend on the worker count
+experiments = ('traffic', 'capacity', 'topology')
+worker_routing = {}  # The routing of the last plain chunk a process ran, keyed by its nodes and edges
+
+
+def sweep_states(simulation, experiment, n_steps, rng=None):
+    """Apply the steps of one experiment to the simulation and yield (graph, N_matrix) after each one.
+
+    experiment is 'traffic' (N grows by 10), 'capacity' (capacities grow by 10 %) or
+    'topology' (2 random edges of average capacity are added).
+    """
+    for _ in range(n_steps):
+        if experiment == 'traffic':
+            simulation.increase_N_values(10)
+        elif experiment == 'capacity':
+            simulation.increase_capacities(10)
+        elif experiment == 'topology':
+            simulation.add_random_edges(2, simulation.average_capacity(), rng)
+        else:
+            raise ValueError(f"Unknown experiment: {experiment}")
+        yield simulation.graph.copy(), simulation.N_matrix.copy()
+
+
+def reliability_chunk(graph, N_matrix, p, m, T_max, n_trials, seed_sequence):
+    """Count the reliable trials of one chunk of a sweep step; runs in a worker process."""
+    simulation = NetworkSimulation(graph, T_max)
+    simulation.N_matrix = N_matrix
+    return simulation.count_reliable(p, m, n_trials, np.random.default_rng(seed_sequence))
+
+
+def plain_reliability_chunk(graph, N_matrix, p, m, T_max, n_trials, seed_sequence):
+    """Count the reliable trials of one chunk of fresh trials of a sweep step; runs in a worker process.
+
+    A chunk with the nodes and edges of the last chunk the process ran (the same step, or a
+    traffic or capacity step after it) reuses its routing, so the shortest-path trees are
+    shared, and capacity steps also keep the evaluation cache, which already holds the flows
+    of the damaged states seen before.
+    """
+    simulation = NetworkSimulation(graph, T_max)
+    simulation.N_matrix = N_matrix
+    key = (tuple(graph.nodes()), tuple(graph.edges()))
+    simulation.routing = worker_routing.pop(key, None)  # Routing ignores capacities, and the edges are the same
+    worker_routing.clear()
+    worker_routing[key] = simulation.get_routing()
+    return simulation.count_reliable(p, m, n_trials, np.random.default_rng(seed_sequence))
+
+
+def common_reliability_chunk(states, columns, p, m, T_max, rows, n_columns):
+    """Count the reliable trials of one chunk of shared scenarios at every step of a sweep.
+
+    Runs in a worker process. The scenarios are unpacked once per topology, and steps that
+    keep the topology of the previous step (traffic and capacity changes) reuse its
+    connectivity and routing; capacity steps also keep the routing's evaluation cache, so
+    they only redo the overload and delay checks.
+    """
+    packed = load_rows(rows)
+    counts = []
+    previous_columns = survival = connected = routing = None
+    for (graph, N_matrix), step_columns in zip(states, columns):
+        simulation = NetworkSimulation(graph, T_max)
+        simulation.N_matrix = N_matrix
+        if step_columns != previous_columns:
+            survival = unpack_survival(packed, n_columns, step_columns)
+            _, endpoints = simulation.edge_index_arrays(graph)
+            connected = bulk_is_connected(endpoints, survival, graph.number_of_nodes())
+            previous_columns = step_columns
+        else:
+            simulation.routing = routing  # Routing ignores capacities, and the edges are the same
+        routing = simulation.get_routing()
+        counts.append(int(np.count_nonzero(simulation.evaluate_survival(survival, m, connected))))
+    return counts
+
+
+def run_plain_sweep(states, p, m, T_max, n_trials, n_workers, seed, done, record):
+    """Evaluate every sweep state on fresh trials, see run_sweep.
+
+    Every (step, chunk) pair is one task with its own seed, and the tasks are submitted step
+    by step, so a process usually runs consecutive chunks on the same network and shares the
+    routing between them (see plain_reliability_chunk). A step is recorded as soon as its
+    chunks, and those of the steps before it, are done; the steps in done are skipped.
+    """
+    chunk_sizes = [min(chunk_trials, n_trials - start) for start in range(0, n_trials, chunk_trials)]
+    step_seeds = seed.spawn(len(states))
+    pending = [step for step in range(len(states)) if step not in done]
+    tasks = {step: [(*states[step], p, m, T_max, size, chunk_seed)
+                    for size, chunk_seed in zip(chunk_sizes, step_seeds[step].spawn(len(chunk_sizes)))]
+             for step in pending}
+    if n_workers == 1:
+        try:
+            for step in pending:
+                counts = [plain_reliability_chunk(*task) for task in tasks[step]]
+                record(step, sum(counts) / n_trials, step_seeds[step])
+        finally:
+            worker_routing.clear()
+        return
+    pool = ProcessPoolExecutor(max_workers=n_workers)
+    try:
+        futures = {step: [pool.submit(plain_reliability_chunk, *task) for task in tasks[step]] for step in pending}
+        for step in pending:
+            record(step, sum(future.result() for future in futures[step]) / n_trials, step_seeds[step])
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def run_common_sweep(states, p, m, T_max, n_trials, n_workers, seed, done, record):
+    """Evaluate every sweep state on one shared block of scenarios, see run_sweep.
+
+    The steps in done are skipped; the others are only known, and recorded, once every
+    chunk of the block has been evaluated.
+    """
+    failures.require_uniform(states[0][0], "common scenarios")
+    edges = {frozenset(edge) for graph, _ in states for edge in graph.edges()}
+    block = ScenarioBlock(n_trials, len(edges), p, seed)
+    pending = [step for step in range(len(states)) if step not in done]
+    try:
+        columns = [block.columns(graph) for graph, _ in states]  # All steps, so the columns stay the same
+        pending_states = [states[step] for step in pending]
+        pending_columns = [columns[step] for step in pending]
+        tasks = [(pending_states, pending_columns, p, m, T_max, block.rows(start, start + chunk_trials),
+                  block.n_columns)
+                 for start in range(0, n_trials, chunk_trials)]
+        if n_workers == 1:
+            counts = [common_reliability_chunk(*task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers) as pool:
+                counts = list(pool.map(common_reliability_chunk, *zip(*tasks)))
+    finally:
+        block.close()
+    for step, step_counts in zip(pending, zip(*counts)):
+        record(step, sum(step_counts) / n_trials, seed)
+
+
+def run_adaptive_sweep(states, p, m, T_max, n_trials, n_workers, seed, rule, done, record):
+    """Evaluate every sweep state until its confidence interval meets the rule, see run_sweep.
+
+    All steps run their first n_trials trials, then only the steps that are not precise yet
+    get another batch, sized by netsim.stopping.next_batch, in rounds over one process pool.
+    Every step keeps drawing chunk seeds from its own SeedSequence, so the result does not
+    depend on the number of workers. A step is recorded as soon as it stops; the steps in
+    done are skipped.
+    """
+    stopping.check_rule(rule)
+    step_seeds = seed.spawn(len(states))
+    reliable = [0] * len(states)
+    used = [0] * len(states)
+    batches = [0 if step in done else min(n_trials, rule.max_trials) for step in range(len(states))]
+    pool = None if n_workers == 1 else ProcessPoolExecutor(max_workers=n_workers)
+    try:
+        while any(batches):
+            steps, tasks = [], []
+            for step, batch in enumerate(batches):
+                sizes = [min(chunk_trials, batch - start) for start in range(0, batch, chunk_trials)]
+                for size, chunk_seed in zip(sizes, step_seeds[step].spawn(len(sizes))):
+                    steps.append(step)
+                    tasks.append((*states[step], p, m, T_max, size, chunk_seed))
+            if pool is None:
+                counts = [reliability_chunk(*task) for task in tasks]
+            else:
+                counts = list(pool.map(reliability_chunk, *zip(*tasks)))
+            for step, task, count in zip(steps, tasks, counts):
+                reliable[step] += count
+                used[step] += task[5]
+            for step, batch in enumerate(batches):
+                if batch:
+                    estimate = stopping.estimate(rule, reliable[step], used[step])
+                    batches[step] = stopping.next_batch(rule, estimate, n_trials)
+                    if not batches[step]:
+                        record(step, estimate, step_seeds[step])
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+def store_params(p, m, n_trials, n_steps, sweep_seed, common, rule):
+    """Return the sweep parameters a ResultStore matches runs and sessions by."""
+    return {'p': p, 'm': m, 'n_trials': n_trials, 'n_steps': n_steps, 'sweep_seed': sweep_seed,
+            'common': common, 'rule': rule._asdict() if rule is not None else None}
+
+
+def run_sweep(simulation, experiment, p, m, n_trials, n_steps, n_workers=None, sweep_seed=None, common=False,
+              rule=None, store=None, session=None):
+    """Run the steps of one experiment over a process pool and return the reliability of every step.
+
+    Every step is split into chunks of chunk_trials trials and every chunk gets its own random
+    stream spawned from one SeedSequence. Chunks are merged in submission order, so the
+    result only depends on the seed, never on the number of workers. With common=True all
+    steps see the same failure scenarios instead (common random numbers), which makes the
+    differences between steps much less noisy. With a StoppingRule every step runs until
+    its confidence interval is narrow enough and the result is a list of AdaptiveEstimate.
+
+    With a netsim.store.ResultStore every finished step is appended to the store right away.
+    A sweep that matches an unfinished run of the store (same parameters, starting network
+    and sweep_seed) resumes it: the recorded steps come from the store and only the missing
+    ones are run, with the seed entropy of the stored run. With a fixed sweep_seed, or
+    when it belongs to the given session id (see ResultStore.open_session), a finished run
+    is reused as well.
+    """
+    if rule is not None and common:
+        raise ValueError("adaptive stopping needs fresh trials and cannot use common scenarios")
+    seed = np.random.SeedSequence(sweep_seed)
+    run = None
+    if store is not None:
+        params = store_params(p, m, n_trials, n_steps, sweep_seed, common, rule)
+        run = store.open_run(simulation, experiment, params, seed.entropy, reuse_finished=sweep_seed is not None,
+                             session=session)
+        seed = np.random.SeedSequence(run.entropy)
+    results = dict(run.results) if run is not None else {}
+    done = set(results)
+
+    def record(step, reliability, seed_sequence):
+        results[step] = reliability
+        if run is not None:
+            run.record(step, reliability, seed_sequence)
+
+    topology_seed, trials_seed = seed.spawn(2)
+    states = list(sweep_states(simulation, experiment, n_steps, np.random.default_rng(topology_seed)))
+    if len(done) < n_steps:
+        if rule is not None:
+            run_adaptive_sweep(states, p, m, simulation.T_max, n_trials, n_workers, trials_seed, rule, done, record)
+        elif common:
+            run_common_sweep(states, p, m, simulation.T_max, n_trials, n_workers, trials_seed, done, record)
+        else:
+            run_plain_sweep(states, p, m, simulation.T_max, n_trials, n_workers, trials_seed, done, record)
+    if run is not None:
+        run.finish()
+    return [results[step] for step in range(n_steps)]
+
+
+def describe(reliability):
+    """Format a sweep result, with its interval and trials when it is an AdaptiveEstimate."""
+    if isinstance(reliability, stopping.AdaptiveEstimate):
+        return (f"{reliability.reliability} ({reliability.lower:.4f}..{reliability.upper:.4f},"
+                f" {reliability.n_trials} trials)")
+    return f"{reliability}"
+
+
+def run_experiments(simulation, p, m, n_trials, n_steps, n_workers=None, sweep_seed=None, log=print,
+                    common=False, rule=None, store=None):
+    """Run the three lab experiments one after another and return their reliability curves.
+
+    Every experiment starts from the state the previous one left behind, like in the original
+    lab script: traffic is restored after experiment 1 and capacities after experiment 2.
+    common=True reuses one block of failure scenarios across the steps of every sweep, and
+    a StoppingRule runs every step until its confidence interval is narrow enough. With a
+    ResultStore the steps are checkpointed and an interrupted call resumes, see run_sweep:
+    the three sweeps form one session of the store, so the sweeps that finished before the
+    interruption are reused even without a sweep_seed.
+    """
+    session = None
+    if store is not None:
+        session = store.open_session(simulation, store_params(p, m, n_trials, n_steps, sweep_seed, common, rule))
+    # Experiment 1: Increase N values
+    N_copy = simulation.N_matrix.copy()
+    reliabilities_1 = run_sweep(simulation, 'traffic', p, m, n_trials, n_steps, n_workers, sweep_seed, common,
+                                rule, store, session)
+    for step, reliability in enumerate(reliabilities_1):
+        log(f"Reliability after increasing N by {step + 1} increments: {describe(reliability)}")
+    simulation.N_matrix = N_copy
+
+    # Experiment 2: Increase capacities
+    initial_capacities = {(u, v): simulation.graph[u][v]['c'] for u, v in simulation.graph.edges()}
+    reliabilities_2 = run_sweep(simulation, 'capacity', p, m, n_trials, n_steps, n_workers, sweep_seed, common,
+                                rule, store, session)
+    for step, reliability in enumerate(reliabilities_2):
+        log(f"Reliability after increasing capacities by {step + 10} % increments: {describe(reliability)}")
+    simulation.reset_capacities(initial_capacities)
+
+    # Experiment 3: Add random edges
+    reliabilities_3 = run_sweep(simulation, 'topology', p, m, n_trials, n_steps, n_workers, sweep_seed, common,
+                                rule, store, session)
+    for step, reliability in enumerate(reliabilities_3):
+        log(f"Reliability after adding {2 * (step + 1)} new edges: {describe(reliability)}")
+    if store is not None:
+        store.finish_session(session)
+    return reliabilities_1, reliabilities_2, reliabilities_3
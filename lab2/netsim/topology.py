@@ -0,0 +1,104 @@
+import random
+
+import networkx as nx
+
+V = 20  # Number of vertices in the base topology
+base_edges = [
+    (1, 2), (2, 3), (3, 4), (4, 5),
+    (5, 6), (6, 7), (7, 8), (1, 8),
+    (2, 9), (4, 10), (5, 11), (7, 12),
+    (9, 10), (10, 11), (11, 12), (12, 9),
+    (9, 13), (11, 14), (10, 15), (12, 16),
+    (13, 17), (14, 18), (15, 19), (16, 20),
+    (17, 18), (18, 19), (19, 20), (20, 17)
+]
+min_capacity = 7000000  # Range of the random edge capacities in bits per second
+max_capacity = 10000000
+
+
+def build_base_topology(rng=random):
+    """Build the 20-node lab topology with individual random capacities on the edges."""
+    graph = nx.Graph()
+    graph.add_nodes_from(range(1, V + 1))
+    for u, v in base_edges:
+        capacity = rng.randint(min_capacity, max_capacity)  # Random capacity for each edge
+        graph.add_edge(u, v, c=capacity)
+    return graph
+
+
+def assign_capacities(graph, rng=random):
+    """Give every edge of the graph a random capacity between min_capacity and max_capacity."""
+    for u, v in graph.edges():
+        graph[u][v]['c'] = rng.randint(min_capacity, max_capacity)
+    return graph
+
+
+def largest_component(graph):
+    """Return the largest connected component of the graph, or the graph itself if it is connected."""
+    if graph.number_of_nodes() == 0 or nx.is_connected(graph):
+        return graph
+    return graph.subgraph(max(nx.connected_components(graph), key=len)).copy()
+
+
+def grid_topology(rows, columns, rng=random):
+    """Build a rows x columns grid; nodes are labelled by their (row, column) tuples."""
+    return assign_capacities(nx.grid_2d_graph(rows, columns), rng)
+
+
+def waxman_topology(n_nodes, alpha=0.1, beta=0.4, rng=random):
+    """Build a Waxman random geometric graph and keep its largest connected component.
+
+    Nodes in the unit square are linked with probability beta exp(-d / (alpha L)).
+    """
+    graph = nx.waxman_graph(n_nodes, beta=beta, alpha=alpha, seed=rng.getrandbits(32))
+    return assign_capacities(largest_component(graph), rng)
+
+
+def barabasi_albert_topology(n_nodes, attached=2, rng=random):
+    """Build a Barabasi-Albert scale-free graph where every new node links to `attached` others."""
+    return assign_capacities(nx.barabasi_albert_graph(n_nodes, attached, seed=rng.getrandbits(32)), rng)
+
+
+def generated_topology(spec, rng=random):
+    """Build a topology from a 'grid:ROWSxCOLUMNS', 'waxman:N' or 'ba:N' specification."""
+    kind, _, size = spec.partition(':')
+    try:
+        if kind == 'grid':
+            rows, columns = size.split('x')
+            return grid_topology(int(rows), int(columns), rng)
+        if kind == 'waxman':
+            return waxman_topology(int(size), rng=rng)
+        if kind == 'ba':
+            return barabasi_albert_topology(int(size), rng=rng)
+    except ValueError:
+        raise ValueError(f"bad topology size in '{spec}'") from None
+    raise ValueError(f"unknown topology '{spec}', expected grid:ROWSxCOLUMNS, waxman:N or ba:N")
+
+
+def read_topology(path):
+    """Read a topology from an edge list file with one 'u v capacity [p]' line per edge.
+
+    The optional p is the edge's own survival probability, see netsim.failures. Node labels
+    are kept as strings unless they are all integers; nodes are put in sorted order, so
+    traffic matrix positions follow the labels.
+    """
+    edges = nx.Graph()
+    with open(path) as file:
+        for line in file:
+            fields = line.split('#')[0].split()
+            if not fields:
+                continue
+            if len(fields) not in (3, 4):
+                raise ValueError(f"{path}: expected 'u v capacity [p]', got {line.strip()!r}")
+            data = {'c': float(fields[2])}
+            if len(fields) == 4:
+                data['p'] = float(fields[3])
+            edges.add_edge(fields[0], fields[1], **data)
+    try:
+        labels = {node: int(node) for node in edges}
+    except ValueError:
+        labels = {node: node for node in edges}
+    graph = nx.Graph()
+    graph.add_nodes_from(sorted(labels.values()))
+    graph.add_edges_from((labels[u], labels[v], data) for u, v, data in edges.edges(data=True))
+    return graph
@@ -0,0 +1,93 @@
+"""Traffic demands between the nodes of a topology, dense or sparse.
+
+A traffic matrix is indexed by node position, the order of graph.nodes(). Small networks
+keep the lab's dense (V x V) N matrix; large ones use Demands, which only stores the node
+pairs that exchange traffic, so memory grows with the number of demands instead of V^2.
+Everything that routes traffic goes through as_demands and accepts either form.
+"""
+import random
+
+import numpy as np
+
+# All-pairs traffic has V (V - 1) demands, and the routing keeps every demand's path: about
+# 1.5 kB per demand on a 25x25 grid. Networks with more demands than this (about 100 nodes)
+# get sparse Demands instead of a dense N matrix.
+dense_traffic_demands = 10000
+
+
+class Demands:
+    """Sparse traffic: parallel arrays of source and target node positions and their volumes."""
+
+    def __init__(self, sources, targets, volumes, n_nodes):
+        self.sources = np.asarray(sources, dtype=np.int32)
+        self.targets = np.asarray(targets, dtype=np.int32)
+        self.volumes = np.asarray(volumes)
+        self.n_nodes = n_nodes
+
+    @classmethod
+    def from_matrix(cls, N_matrix):
+        """Return the demands of the nonzero entries of a dense traffic matrix."""
+        N_matrix = np.asarray(N_matrix)
+        sources, targets = np.nonzero(N_matrix)
+        return cls(sources, targets, N_matrix[sources, targets], len(N_matrix))
+
+    def to_matrix(self):
+        """Return the dense (V x V) traffic matrix; only sensible for small networks."""
+        N_matrix = np.zeros((self.n_nodes, self.n_nodes), dtype=self.volumes.dtype)
+        np.add.at(N_matrix, (self.sources, self.targets), self.volumes)
+        return N_matrix
+
+    def pair_codes(self):
+        """Return every demand's node pair as the single integer source * V + target."""
+        return self.sources.astype(np.int64) * self.n_nodes + self.targets
+
+    def copy(self):
+        return Demands(self.sources.copy(), self.targets.copy(), self.volumes.copy(), self.n_nodes)
+
+    def __len__(self):
+        return len(self.volumes)
+
+    def __eq__(self, other):
+        return (isinstance(other, Demands) and self.n_nodes == other.n_nodes
+                and np.array_equal(self.sources, other.sources) and np.array_equal(self.targets, other.targets)
+                and np.array_equal(self.volumes, other.volumes))
+
+
+def as_demands(N_matrix):
+    """Return a traffic matrix as Demands, converting a dense matrix."""
+    return N_matrix if isinstance(N_matrix, Demands) else Demands.from_matrix(N_matrix)
+
+
+def same_traffic(first, second):
+    """Tell whether two traffic matrices, dense or sparse, are identical."""
+    if isinstance(first, Demands) or isinstance(second, Demands):
+        return isinstance(first, Demands) and first == second
+    return np.array_equal(first, second)
+
+
+def total_traffic(N_matrix):
+    """Return the total traffic G, the sum of all demands."""
+    return as_demands(N_matrix).volumes.sum()
+
+
+def use_dense_traffic(n_nodes):
+    """Tell whether a network of n_nodes nodes gets the lab's dense all-pairs N matrix."""
+    return n_nodes * (n_nodes - 1) <= dense_traffic_demands
+
+
+def random_demands(n_nodes, n_pairs, rng=random):
+    """Draw traffic between n_pairs distinct random node pairs, 1..10 packets in both directions.
+
+    Same volumes as populate_N_matrix, but only for the chosen pairs.
+    """
+    n_pairs = min(n_pairs, n_nodes * (n_nodes - 1) // 2)
+    pairs = set()
+    while len(pairs) < n_pairs:
+        u, v = rng.randrange(n_nodes), rng.randrange(n_nodes)
+        if u != v:
+            pairs.add((min(u, v), max(u, v)))
+    pairs = sorted(pairs)
+    sources = [u for u, v in pairs] + [v for u, v in pairs]  # Mirror for v to u since it's undirected
+    targets = [v for u, v in pairs] + [u for u, v in pairs]
+    volumes = [rng.randint(1, 10) for _ in pairs]
+    return Demands(sources, targets, np.array(volumes * 2, dtype=np.int64), n_nodes)
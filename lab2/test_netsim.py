@@ -0,0 +1,221 @@
+import itertools
+import random
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from netsim import NetworkSimulation, ResultStore, StoppingRule, build_base_topology, grid_topology, run_sweep
+from netsim import cli, stopping, sweeps
+from netsim.store import SweepRun
+from netsim.topology import assign_capacities
+
+
+def base_simulation(seed=1, trials=100):
+    random.seed(seed)
+    simulation = NetworkSimulation(build_base_topology(), trials=trials)
+    simulation.populate_N_matrix()
+    return simulation
+
+
+def baseline_reliability(graph, N_matrix, p, m, trials, T_max=0.1):
+    """The reliability loop of the original lab script (lab2forrec.py), for nodes 1..V."""
+    count_reliable = 0
+    for _ in range(trials):
+        damaged_graph = graph.copy()
+        for (i, j) in list(damaged_graph.edges()):
+            if random.random() > p:
+                damaged_graph.remove_edge(i, j)
+        if not nx.is_connected(damaged_graph):
+            continue
+        a_values = np.zeros((len(N_matrix), len(N_matrix)), dtype=int)
+        paths = dict(nx.all_pairs_dijkstra_path(damaged_graph))
+        for i in damaged_graph.nodes():
+            for j in damaged_graph.nodes():
+                if i != j:
+                    path = paths[i][j]
+                    for u, v in zip(path, path[1:]):
+                        a_values[u - 1][v - 1] += N_matrix[i - 1][j - 1]
+                        a_values[v - 1][u - 1] += N_matrix[i - 1][j - 1]
+        if any(2 * a_values[i - 1][j - 1] * m > graph[i][j]['c'] for i, j in damaged_graph.edges()):
+            continue
+        total_delay = 0
+        for (i, j) in damaged_graph.edges():
+            a = 2 * a_values[i - 1][j - 1]
+            c = graph[i][j]['c']
+            if c / m - a <= 0:
+                total_delay = float('inf')
+                break
+            total_delay += a / (c / m - a)
+        if total_delay / np.sum(N_matrix) < T_max:
+            count_reliable += 1
+    return count_reliable / trials
+
+
+@pytest.mark.parametrize('p', [0.9, 0.95])
+def test_same_estimate_as_original_loop(p):
+    simulation = base_simulation(trials=200)
+    simulation.increase_N_values(20)  # Some trials overloaded or too slow, not only disconnected
+    random.seed(7)
+    expected = baseline_reliability(simulation.graph, simulation.N_matrix, p, 1500, 200)
+    random.seed(7)
+    assert simulation.simulate_reliability(p, 1500) == expected
+    random.seed(7)
+    assert simulation.simulate_reliability_batched(p, 1500) == expected
+
+
+def brute_force_reliability(simulation, p, m):
+    n_edges = simulation.graph.number_of_edges()
+    survival = np.array(list(itertools.product([True, False], repeat=n_edges)))
+    failed = (~survival).sum(axis=1)
+    probabilities = p ** (n_edges - failed) * (1 - p) ** failed
+    return float((probabilities * simulation.evaluate_survival(survival, m)).sum())
+
+
+@pytest.mark.parametrize('p, m', [(0.9, 500), (0.7, 1500), (0.8, 3000)])
+def test_exact_reliability_matches_enumeration(p, m):
+    random.seed(3)
+    simulation = NetworkSimulation(assign_capacities(grid_topology(3, 3)))
+    simulation.populate_N_matrix()
+    result = simulation.exact_reliability(p, m)
+    assert result.reliability == pytest.approx(brute_force_reliability(simulation, p, m), abs=1e-12)
+
+
+def test_reliability_bounds_contain_exact_value_and_warn_when_wide():
+    random.seed(3)
+    simulation = NetworkSimulation(assign_capacities(grid_topology(3, 3)))
+    simulation.populate_N_matrix()
+    exact = simulation.exact_reliability(0.9, 1500).reliability
+    with pytest.warns(RuntimeWarning, match='wide'):
+        wide = simulation.reliability_bounds(0.9, 1500, max_states=5)
+    assert wide.reliability <= exact <= wide.upper_bound and wide.upper_bound - wide.reliability > 0.01
+    tight = simulation.reliability_bounds(0.9, 1500, tolerance=1e-9, max_states=None)
+    assert tight.reliability <= exact <= tight.upper_bound <= tight.reliability + 1e-9
+
+
+@pytest.mark.parametrize('mode', ['plain', 'common', 'adaptive'])
+def test_sweep_does_not_depend_on_worker_count(mode):
+    options = {'common': mode == 'common',
+               'rule': StoppingRule(half_width=0.02, max_trials=4000) if mode == 'adaptive' else None}
+    results = []
+    for n_workers in (1, 2):
+        simulation = base_simulation()
+        results.append(run_sweep(simulation, 'capacity', 0.9, 1500, 2500, 2, n_workers, sweep_seed=11, **options))
+    assert results[0] == results[1]
+
+
+def interrupt_after(monkeypatch, n_records):
+    # Let n_records steps reach the store, then stop the sweep as if the process was killed
+    record = SweepRun.record
+    calls = []
+
+    def interrupted(self, *args, **kwargs):
+        if len(calls) == n_records:
+            raise KeyboardInterrupt
+        calls.append(args)
+        return record(self, *args, **kwargs)
+
+    monkeypatch.setattr(SweepRun, 'record', interrupted)
+    return lambda: monkeypatch.setattr(SweepRun, 'record', record)
+
+
+@pytest.mark.parametrize('sweep_seed', [5, None])
+def test_store_resumes_interrupted_sweep(tmp_path, monkeypatch, sweep_seed):
+    store = ResultStore(tmp_path / 'results.jsonl')
+    restore = interrupt_after(monkeypatch, 1)
+    with pytest.raises(KeyboardInterrupt):
+        run_sweep(base_simulation(), 'traffic', 0.9, 1500, 500, 3, 1, sweep_seed, store=store)
+    restore()
+    recorded = [item['step'] for item in store.records('step')]
+    assert recorded == [0]
+    resumed = run_sweep(base_simulation(), 'traffic', 0.9, 1500, 500, 3, 1, sweep_seed, store=store)
+    assert sorted(item['step'] for item in store.records('step')) == [0, 1, 2]
+    assert len(list(store.records('run'))) == 1
+    if sweep_seed is not None:
+        assert resumed == run_sweep(base_simulation(), 'traffic', 0.9, 1500, 500, 3, 1, sweep_seed)
+
+
+def test_plain_sweep_records_every_step_when_done(tmp_path, monkeypatch):
+    # Each step reaches the store before the chunks of the next one run, so an interruption loses one step at most
+    chunks, recorded = [], []
+    chunk = sweeps.plain_reliability_chunk
+    record = SweepRun.record
+    monkeypatch.setattr(sweeps, 'plain_reliability_chunk', lambda *task: chunks.append(task) or chunk(*task))
+    monkeypatch.setattr(SweepRun, 'record', lambda self, step, *args: recorded.append((step, len(chunks)))
+                        or record(self, step, *args))
+    run_sweep(base_simulation(), 'capacity', 0.9, 1500, 2500, 3, 1, 5, store=ResultStore(tmp_path / 'results.jsonl'))
+    assert recorded == [(0, 3), (1, 6), (2, 9)]
+
+
+def test_store_resumes_session_without_seed(tmp_path, monkeypatch):
+    store = ResultStore(tmp_path / 'results.jsonl')
+    calls = []
+    original = sweeps.run_sweep
+
+    def counting(simulation, experiment, *args, **kwargs):
+        calls.append(experiment)
+        if experiment == 'topology' and calls.count('topology') == 1:
+            raise KeyboardInterrupt
+        return original(simulation, experiment, *args, **kwargs)
+
+    monkeypatch.setattr(sweeps, 'run_sweep', counting)
+    with pytest.raises(KeyboardInterrupt):
+        sweeps.run_experiments(base_simulation(), 0.9, 1500, 300, 2, 1, log=lambda message: None, store=store)
+    first = {item['run']: item['reliability'] for item in store.records('step')}
+    sweeps.run_experiments(base_simulation(), 0.9, 1500, 300, 2, 1, log=lambda message: None, store=store)
+    runs = [item['experiment'] for item in store.records('run')]
+    assert runs == ['traffic', 'capacity', 'topology']
+    assert {item['run']: item['reliability'] for item in store.records('step') if item['run'] in first} == first
+
+
+def test_evaluation_cache_trimmed_between_calls():
+    # With more distinct states than max_cached_trees the cache is trimmed, but never while a call still reads it
+    expected = base_simulation().simulate_reliability_batched(0.8, 1500, 2000, np.random.default_rng(0))
+    simulation = base_simulation()
+    simulation.get_routing().max_cached_trees = 50
+    assert simulation.simulate_reliability_batched(0.8, 1500, 2000, np.random.default_rng(0)) == expected
+    assert simulation.simulate_reliability_batched(0.8, 1500, 2000, np.random.default_rng(1)) >= 0
+    assert len(simulation.get_routing().evaluations) <= 2000
+
+
+@pytest.mark.parametrize('interval', ['wilson', 'clopper-pearson'])
+def test_relative_error_exemption_only_without_successes(interval):
+    rule = StoppingRule(relative_error=0.1, interval=interval)
+    # No successes: the upper bound has to fall below the relative error, then the estimate is zero to within it
+    assert not stopping.is_precise(rule, stopping.estimate(rule, 0, 20))
+    assert stopping.is_precise(rule, stopping.estimate(rule, 0, 100))
+    # A few successes are held to the relative error, however low the upper bound is
+    assert not stopping.is_precise(rule, stopping.estimate(rule, 3, 100))
+    assert not stopping.is_precise(rule, stopping.estimate(rule, 1, 10000))
+    assert stopping.next_batch(rule, stopping.estimate(rule, 3, 100), 100) > 0
+    assert stopping.is_precise(rule, stopping.estimate(rule, 3000, 10000))
+
+
+def test_command_line_resumes_without_seed(tmp_path, monkeypatch):
+    # Without --seed the command keeps its seed in the store, so a restart builds the same network and resumes
+    argv = ['--topology', 'grid:3x3', '--trials', '200', '--steps', '2', '--workers', '1',
+            '--store', str(tmp_path / 'results.jsonl')]
+    store = ResultStore(tmp_path / 'results.jsonl')
+    restore = interrupt_after(monkeypatch, 3)
+    with pytest.raises(KeyboardInterrupt):
+        cli.main(argv)
+    restore()
+    cli.main(argv)
+    assert len(list(store.records('command'))) == 1
+    assert [item['experiment'] for item in store.records('run')] == ['traffic', 'capacity', 'topology']
+    assert len(list(store.records('step'))) == 6
+    cli.main(argv)  # The first command finished, so this one draws a new network
+    assert len({item['seed'] for item in store.records('command')}) == 2
+    assert len(list(store.records('run'))) == 6
+
+
+def test_direct_capacity_change_is_seen():
+    # Capacities are cached per call, so a 'c' attribute set on the graph counts from the next call on
+    simulation = base_simulation(trials=50)
+    assert simulation.simulate_reliability_batched(1.0, 1500) == 1.0
+    assert simulation.simulate_reliability(1.0, 1500) == 1.0
+    for u, v in simulation.graph.edges():
+        simulation.graph[u][v]['c'] = 1000
+    assert simulation.simulate_reliability_batched(1.0, 1500) == 0.0
+    assert simulation.simulate_reliability(1.0, 1500) == 0.0
+    assert simulation.calculate_T(simulation.graph, 1500) == float('inf')
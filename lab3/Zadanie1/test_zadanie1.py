@@ -0,0 +1,268 @@
+import logging
+import random
+
+import numpy as np
+import pytest
+
+import zadanie1 as z
+
+
+def random_data(rng, n_frames, frame_size):
+    # Losowe dane z długimi seriami jedynek, żeby stuffing miał co robić.
+    return bytes(rng.choice([0xFF, 0x7F, 0xFE, rng.randrange(256)]) for _ in range(n_frames * frame_size))
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_stuffing(seed):
+    # Na losowych danych z długimi seriami jedynek: destuff(stuff(x)) == x, brak sześciu jedynek z rzędu
+    # po stuffingu, zgodność z automatem bit po bicie i wynik niezależny od podziału na kawałki.
+    rng = np.random.default_rng(seed)
+    for _ in range(50):
+        length = int(rng.integers(200))
+        bits = (rng.random(length) < rng.choice([0.5, 0.8, 0.95])).astype(np.uint8)
+        stuffed = z.stuff_bits(bits)
+        assert stuffed.tolist() == z.stuff_bits_loop(bits.tolist())
+        assert '111111' not in z.bits_to_string(stuffed)
+        assert z.unstuff_bits(stuffed).tolist() == bits.tolist()
+        assert z.unstuff_bits_loop(stuffed.tolist()) == bits.tolist()
+        cuts = np.sort(rng.integers(0, length + 1, size=3))
+        assert np.concatenate(list(z.stuff_stream(np.split(bits, cuts)))).tolist() == stuffed.tolist()
+        assert np.concatenate(list(z.unstuff_stream(np.split(stuffed, cuts)))).tolist() == bits.tolist()
+
+
+def test_unstuff_rejects_six_ones():
+    assert z.unstuff_bits(np.array([0, 1, 1, 1, 1, 1, 1, 0], dtype=np.uint8)) is None
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_crc_methods_agree(seed):
+    # Wszystkie metody dają bit po bicie to samo co metoda tablicowa.
+    rng = random.Random(seed)
+    for _ in range(50):
+        data = rng.randbytes(rng.randrange(300))
+        expected = z.crc32_table(data)
+        assert {name: method(data) for name, method in z.CRC_METHODS.items()} == dict.fromkeys(z.CRC_METHODS, expected)
+
+
+@pytest.mark.parametrize('length', (0, 1, 7, 8, 9, 64, 101))
+def test_crc32_batch(length):
+    rng = random.Random(length)
+    frames = [rng.randbytes(length) for _ in range(20)]
+    expected = [z.crc32_table(frame) for frame in frames]
+    assert z.crc32_batch(frames).tolist() == expected
+    assert z.crc32_batch(np.frombuffer(b''.join(frames), dtype=np.uint8).reshape(20, length)).tolist() == expected
+
+
+def test_crc32_batch_empty():
+    assert z.crc32_batch([]).dtype == np.uint32 and len(z.crc32_batch([])) == 0
+    assert len(z.crc32_batch(np.zeros((0, 16), dtype=np.uint8))) == 0
+    with pytest.raises(ValueError):
+        z.crc32_batch([b'ab', b'abc'])
+
+
+@pytest.mark.parametrize('seed', range(4))
+@pytest.mark.parametrize('fec', z.FEC_SCHEMES)
+def test_fec_round_trip_and_single_bit(fec, seed):
+    # Dekodowanie bez błędów zwraca dane bez poprawek, a jeden przekłamany bit kodu jest poprawiany.
+    rng = random.Random(seed)
+    for _ in range(50):
+        data = rng.randbytes(rng.randint(1, 600))
+        encoded = z.fec_encode(data, fec)
+        assert len(encoded) == z.fec_size(len(data), fec)
+        assert z.fec_decode(encoded, fec) == (data, 0)
+        damaged = bytearray(encoded)
+        damaged[rng.randrange(len(damaged))] ^= 1 << rng.randrange(8)
+        assert z.fec_decode(bytes(damaged), fec)[0] == data
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_rs_corrects_half_parity_per_block(seed):
+    rng = random.Random(seed)
+    for _ in range(50):
+        data = rng.randbytes(rng.randint(1, 600))
+        damaged = bytearray(z.fec_encode(data, 'rs'))
+        for start in range(0, len(damaged), z.RS_BLOCK):
+            block = range(start, min(start + z.RS_BLOCK, len(damaged)))
+            for position in rng.sample(block, rng.randint(0, z.RS_PARITY // 2)):
+                damaged[position] ^= rng.randrange(1, 256)
+        assert z.fec_decode(bytes(damaged), 'rs')[0] == data
+
+
+def test_rs_rejects_block_without_data():
+    assert z.rs_decode(bytes(z.RS_BLOCK + z.RS_PARITY)) == (None, 0)
+    assert z.rs_blocks(np.zeros(z.RS_BLOCK + z.RS_PARITY, dtype=np.uint8)) is None
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_hamming_detects_two_bits_in_a_byte(seed):
+    rng = random.Random(seed)
+    for _ in range(50):
+        damaged = bytearray(z.fec_encode(rng.randbytes(rng.randint(1, 600)), 'hamming'))
+        first, second = rng.sample(range(8), 2)
+        damaged[rng.randrange(len(damaged))] ^= 1 << first | 1 << second
+        assert z.fec_decode(bytes(damaged), 'hamming')[0] is None
+
+
+@pytest.mark.parametrize('fec', (None,) + z.FEC_SCHEMES)
+def test_string_frame_converts_to_binary_frame(fec):
+    # Ramka tekstowa przepisana na binarną jest poprawną ramką binarną z tymi samymi danymi i wraca bez zmian.
+    rng = random.Random(6)
+    text = ''.join(rng.choice('0111') for _ in range(500))
+    for frame in z.frame_data(text, 100):
+        binary = z.string_frame_to_binary(frame, fec)
+        assert z.decode_frame_bits(binary, fec) == (True, z.verify_frame(frame)[1].encode('ascii'))
+        assert z.binary_frame_to_string(binary, fec) == frame
+        assert z.verify_frame(z.binary_frame_to_string(z.encode_frame_bits(b'0110', fec), fec)) == (True, '0110')
+
+
+def test_converted_frame_keeps_damage():
+    frame = z.frame_data('0110' * 25, 100)[0]
+    damaged = frame[:-9] + ('1' if frame[-9] == '0' else '0') + frame[-8:]  # Przekłamany bit FCS
+    assert z.decode_frame_bits(z.string_frame_to_binary(damaged))[0] is False
+    with pytest.raises(ValueError):
+        z.binary_frame_to_string(z.encode_frame_bits(b'abc'))
+    with pytest.raises(ValueError):
+        z.string_frame_to_binary('0110')
+
+
+@pytest.mark.parametrize('fec', (None,) + z.FEC_SCHEMES)
+def test_frame_round_trip(fec):
+    # Ramki zakodowane i spakowane jedna za drugą wracają ze skanera flag bez zmian, a skanowanie
+    # strumienia kawałkami daje to samo co skanowanie całego bufora.
+    rng = random.Random(1)
+    data = random_data(rng, 20, 100)
+    frames = z.frame_bytes(data, 100, fec)
+    assert all(z.decode_frame_bits(frame, fec) == (True, data[100 * k:100 * (k + 1)]) for k, frame in enumerate(frames))
+    packed, _ = z.pack_frames(frames)
+    scanned = list(z.scan_frames(packed, fec=fec))
+    assert b''.join(payload for _, payload, _ in scanned) == data and all(ok for _, _, ok in scanned)
+    for chunk_size in (1, 7, 512):
+        chunks = [packed[i:i + chunk_size] for i in range(0, len(packed), chunk_size)]
+        assert list(z.scan_stream(chunks, fec=fec)) == scanned
+
+
+def test_scan_offsets_are_opening_flags():
+    rng = random.Random(7)
+    frames = [z.encode_frame_bits(rng.randbytes(rng.randint(0, 200))) for _ in range(30)]
+    packed, _ = z.pack_frames(frames)
+    starts = np.cumsum([0] + [len(frame) for frame in frames[:-1]]).tolist()
+    assert [offset for offset, _, _ in z.scan_frames(packed)] == starts
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_scan_resynchronizes_after_corrupted_flags(seed):
+    # Przekłamane flagi między ramkami 3 i 4 sklejają je w jedną uszkodzoną ramkę, a skaner
+    # odnajduje następne ramki bez strat.
+    rng = random.Random(seed)
+    payloads = [rng.randbytes(rng.randint(1, 200)) for _ in range(10)]
+    frames = [z.encode_frame_bits(payload) for payload in payloads]
+    frames[3] = frames[3].copy()
+    frames[4] = frames[4].copy()
+    frames[3][-8 + rng.randrange(8)] ^= 1
+    frames[4][rng.randrange(8)] ^= 1
+    packed, _ = z.pack_frames(frames)
+    scanned = list(z.scan_frames(packed))
+    assert [payload for _, payload, ok in scanned if ok] == payloads[:3] + payloads[5:]
+    assert not all(ok for _, _, ok in scanned)
+    chunks = [packed[i:i + 64] for i in range(0, len(packed), 64)]
+    assert list(z.scan_stream(chunks)) == scanned
+
+
+@pytest.mark.parametrize('fec', (None,) + z.FEC_SCHEMES)
+def test_scan_stream_overlong_body(fec):
+    # Zbyt długie wnętrze ramki między dwiema poprawnymi jest zgłaszane jako uszkodzona ramka także
+    # wtedy, gdy przechodzi przez granice kawałków.
+    rng = random.Random(2)
+    junk = z.stuff_bits(np.array([rng.randrange(2) for _ in range(8 * 3000)], dtype=np.uint8))
+    bits = np.concatenate([z.encode_frame_bits(rng.randbytes(100), fec), junk, z.FLAG_BITS,
+                           z.encode_frame_bits(rng.randbytes(100), fec)])
+    packed, _ = z.pack_frames([bits])
+    scanned = list(z.scan_frames(packed, 100, fec))
+    assert [ok for _, _, ok in scanned] == [True, False, True]
+    chunks = [packed[i:i + 512] for i in range(0, len(packed), 512)]
+    assert list(z.scan_stream(chunks, 100, fec)) == scanned
+
+
+@pytest.mark.parametrize('fec', z.FEC_SCHEMES)
+def test_fec_repairs_single_flips(fec):
+    # Jeden przekłamany bit między flagami, także zmieniający stuffing, jest poprawiany bez retransmisji.
+    rng = random.Random(3)
+    for _ in range(50):
+        data = random_data(rng, 1, rng.randint(1, 300))
+        frame = z.encode_frame_bits(data, fec)
+        frame[rng.randrange(8, len(frame) - 8)] ^= 1
+        assert z.decode_frame_bits(frame, fec) == (True, data)
+
+
+def test_fec_report():
+    results = z.fec_report((0.0, 1.0), n_frames=20, frame_size=100)
+    assert len(results) == 2 * (1 + len(z.FEC_SCHEMES))
+    assert all(result.damaged == 0 for result in results if result.probability == 0.0)
+    assert all(result.damaged == 20 for result in results if result.fec is None and result.probability == 1.0)
+    assert 'hamming' in z.format_fec_report(results)
+
+
+@pytest.mark.parametrize('fec', (None,) + z.FEC_SCHEMES)
+@pytest.mark.parametrize('chunk_size', (1, 77, 4096))
+def test_file_round_trip(tmp_path, fec, chunk_size):
+    # Plik przechodzi przez ramkowanie i dekodowanie bez zmian, przy dowolnych granicach kawałków.
+    data = random.Random(4).randbytes(5000)
+    (tmp_path / 'source.bin').write_bytes(data)
+    written = z.frame_file(tmp_path / 'source.bin', tmp_path / 'framed.bin', frame_size=300, chunk_size=chunk_size,
+                           fec=fec)
+    assert written == (tmp_path / 'framed.bin').stat().st_size
+    counts = z.unframe_file(tmp_path / 'framed.bin', tmp_path / 'target.bin', chunk_size=chunk_size, fec=fec)
+    assert counts == (17, 0)
+    assert (tmp_path / 'target.bin').read_bytes() == data
+
+
+def test_file_round_trip_drops_damaged_frame(tmp_path):
+    # Uszkodzona ramka w pliku jest liczona i pomijana, reszta danych przechodzi.
+    data = random.Random(5).randbytes(3000)
+    (tmp_path / 'source.bin').write_bytes(data)
+    z.frame_file(tmp_path / 'source.bin', tmp_path / 'framed.bin', frame_size=300, chunk_size=101)
+    framed = bytearray((tmp_path / 'framed.bin').read_bytes())
+    framed[len(framed) // 2] ^= 0x10
+    (tmp_path / 'framed.bin').write_bytes(bytes(framed))
+    good, damaged = z.unframe_file(tmp_path / 'framed.bin', tmp_path / 'target.bin', chunk_size=64)
+    assert (good, damaged) == (9, 1)
+    target = (tmp_path / 'target.bin').read_bytes()
+    assert len(target) == 2700 and target in {data[:k] + data[k + 300:] for k in range(0, 3000, 300)}
+
+
+def test_empty_file(tmp_path):
+    (tmp_path / 'source.bin').write_bytes(b'')
+    assert z.frame_file(tmp_path / 'source.bin', tmp_path / 'framed.bin') == 0
+    assert z.unframe_file(tmp_path / 'framed.bin', tmp_path / 'target.bin') == (0, 0)
+    assert (tmp_path / 'target.bin').read_bytes() == b''
+
+
+def test_verify_frames_parallel():
+    rng = random.Random(5)
+    frames = z.frame_bytes(rng.randbytes(3000), 100, 'hamming')
+    frames[4] = frames[4].copy()
+    frames[4][8:24] ^= 1  # Za dużo błędów, żeby je poprawić
+    expected = z.VerificationResult(len(frames) - 1, 1, [4])
+    assert z.verify_frames_parallel(frames, n_workers=1, batch_size=7, fec='hamming') == expected
+    assert z.verify_frames_parallel(frames, n_workers=2, batch_size=7, threads=True, fec='hamming') == expected
+
+
+def test_verify_text_frames_parallel_matches_process_frames():
+    # Ramki tekstowe z generatora, w puli procesów, dają te same liczby co process_frames.
+    random.seed(8)
+    text = ''.join(random.choice('01') for _ in range(3000))
+    frames = [z.corrupt_frame(frame) for frame in z.frame_data(text, 50)]
+    repaired, damaged_count = z.process_frames(frames)
+    result = z.verify_frames_parallel(iter(frames), n_workers=2, batch_size=8)
+    assert (result.valid, result.damaged) == (len(repaired), damaged_count)
+    assert [frames[k] for k in result.damaged_indices] == [frame for frame in frames if not z.verify_frame(frame)[0]]
+
+
+def test_verify_frame_logs_only_at_debug(caplog):
+    frame = z.frame_data('0110', 4)[0]
+    with caplog.at_level(logging.INFO, logger='zadanie1'):
+        assert z.verify_frame(frame) == (True, '0110')
+    assert not caplog.records
+    with caplog.at_level(logging.DEBUG, logger='zadanie1'):
+        z.verify_frame(frame)
+    assert len(caplog.records) == 1
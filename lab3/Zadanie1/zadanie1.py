@@ -1,48 +1,167 @@
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import itertools
+import logging
+import os
 import random
 import re
+import struct
+import time
+import zlib
+
+import numpy as np
+
+logger = logging.getLogger('zadanie1')
+
+CRC_POLYNOMIAL = 0xEDB88320
+
+
+def generate_crc_table(polynomial=CRC_POLYNOMIAL):
+    # Generowanie tablicy CRC dla każdej możliwej wartości bajtu.
+    crc_table = []
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            # Obliczenie CRC dla pojedynczego bajtu.
+            if crc & 1:
+                crc = (crc >> 1) ^ polynomial
+            else:
+                crc >>= 1
+        crc_table.append(crc)
+    return crc_table
+
+
+def generate_slice8_tables(crc_table):
+    # Tablice dla metody slicing-by-8: tablica k opisuje bajt, za którym jest jeszcze k bajtów zer.
+    tables = [list(crc_table)]
+    for _ in range(7):
+        previous = tables[-1]
+        tables.append([(crc >> 8) ^ crc_table[crc & 0xFF] for crc in previous])
+    return tables
+
+
+# Tablice liczone raz przy imporcie i współdzielone przez wszystkie obiekty CRC32.
+CRC_TABLE = generate_crc_table()
+CRC_TABLES_8 = generate_slice8_tables(CRC_TABLE)
+CRC_TABLES_8_NP = np.array(CRC_TABLES_8, dtype=np.uint32)
+
+
+def crc32_table(data, crc=0):
+    # Klasyczna metoda tablicowa: jeden bajt na iterację pętli.
+    crc ^= 0xFFFFFFFF
+    for byte in data:
+        crc = (crc >> 8) ^ CRC_TABLE[(crc ^ byte) & 0xFF]
+    return crc ^ 0xFFFFFFFF
+
+
+def crc32_slice8(data, crc=0):
+    # Slicing-by-8: osiem bajtów na iterację, osiem odczytów z tablic zamiast ośmiu kroków pętli.
+    t0, t1, t2, t3, t4, t5, t6, t7 = CRC_TABLES_8
+    data = memoryview(data).cast('B')
+    full = len(data) - len(data) % 8
+    crc ^= 0xFFFFFFFF
+    for low, high in struct.iter_unpack('<II', data[:full]):
+        low ^= crc
+        crc = (t7[low & 0xFF] ^ t6[(low >> 8) & 0xFF] ^ t5[(low >> 16) & 0xFF] ^ t4[low >> 24]
+               ^ t3[high & 0xFF] ^ t2[(high >> 8) & 0xFF] ^ t1[(high >> 16) & 0xFF] ^ t0[high >> 24])
+    # Pozostałe (mniej niż 8) bajty liczymy metodą tablicową.
+    for byte in data[full:]:
+        crc = (crc >> 8) ^ t0[(crc ^ byte) & 0xFF]
+    return crc ^ 0xFFFFFFFF
+
+
+def crc32_zlib(data, crc=0):
+    # Delegacja do zlib (kod w C); ten sam wielomian, wartość początkowa i końcowy XOR.
+    return zlib.crc32(data, crc) & 0xFFFFFFFF
+
+
+CRC_METHODS = {
+    'table': crc32_table,
+    'slice8': crc32_slice8,
+    'zlib': crc32_zlib,
+}
+
+
+def crc32_batch(frames):
+    # CRC wielu ramek tej samej długości naraz: tablica (ramki x bajty) i slicing-by-8 w NumPy,
+    # gdzie jedna iteracja pętli przetwarza 8 bajtów wszystkich ramek.
+    if isinstance(frames, np.ndarray):
+        data = np.ascontiguousarray(frames, dtype=np.uint8)
+    else:
+        frames = list(frames)
+        if len({len(frame) for frame in frames}) > 1:
+            raise ValueError("crc32_batch wymaga ramek tej samej długości")
+        data = np.frombuffer(b''.join(frames), dtype=np.uint8).reshape(len(frames), len(frames[0]) if frames else 0)
+    n_frames, length = data.shape
+    if n_frames == 0:
+        return np.empty(0, dtype=np.uint32)  # reshape(0, -1, 8) nie potrafi wyznaczyć wymiaru
+    t0, t1, t2, t3, t4, t5, t6, t7 = CRC_TABLES_8_NP
+    full = length - length % 8
+    blocks = np.ascontiguousarray(data[:, :full].reshape(n_frames, -1, 8).transpose(1, 0, 2))  # (bloki, ramki, 8)
+    # Tablice CRC są liniowe (T[a ^ b] = T[a] ^ T[b]), więc wkład samych danych każdego bloku
+    # 8 bajtów liczymy od razu dla wszystkich bloków, a w pętli zostaje tylko wkład bieżącego CRC.
+    contribution = t7[blocks[..., 0]]
+    for table, column in ((t6, 1), (t5, 2), (t4, 3), (t3, 4), (t2, 5), (t1, 6), (t0, 7)):
+        contribution ^= table[blocks[..., column]]
+    crc = np.full(n_frames, 0xFFFFFFFF, dtype=np.uint32)
+    for k in range(full // 8):
+        crc = contribution[k] ^ t7[crc & 0xFF] ^ t6[(crc >> 8) & 0xFF] ^ t5[(crc >> 16) & 0xFF] ^ t4[crc >> 24]
+    for k in range(full, length):
+        crc = (crc >> 8) ^ t0[(crc ^ data[:, k]) & 0xFF]
+    return crc ^ np.uint32(0xFFFFFFFF)
+
+
+def crc_throughput(size=1 << 20, n_frames=4096, frame_size=1024):
+    # Przepustowość każdej metody w MB/s: pojedynczy bufor o rozmiarze size i wsad n_frames ramek.
+    data = os.urandom(size)
+    results = {}
+    for name, method in CRC_METHODS.items():
+        chunk = data if name != 'table' else data[:size // 16]  # Metoda tablicowa jest zbyt wolna na cały bufor
+        start = time.perf_counter()
+        method(chunk)
+        results[name] = len(chunk) / (time.perf_counter() - start) / 1e6
+    frames = np.frombuffer(os.urandom(n_frames * frame_size), dtype=np.uint8).reshape(n_frames, frame_size)
+    start = time.perf_counter()
+    crc32_batch(frames)
+    results['batch'] = frames.size / (time.perf_counter() - start) / 1e6
+    return results
+
 
 class CRC32:
-    def __init__(self):
-        # Inicjalizacja obiektu CRC32 poprzez wygenerowanie tablicy CRC.
-        self.crc_table = self.generate_crc_table()
+    def __init__(self, method='zlib'):
+        # Tablica CRC jest współdzielona (liczona raz przy imporcie); method wybiera implementację
+        # z CRC_METHODS, wszystkie dają identyczny wynik.
+        self.crc_table = CRC_TABLE
+        self.method = CRC_METHODS[method]
 
     def generate_crc_table(self):
-        # Definicja wielomianu użytego do obliczeń CRC i inicjalizacja pustej tablicy.
-        polynomial = 0xEDB88320
-        crc_table = []
-        # Generowanie tablicy CRC dla każdej możliwej wartości bajtu.
-        for i in range(256):
-            crc = i
-            for _ in range(8):
-                # Obliczenie CRC dla pojedynczego bajtu.
-                if crc & 1:
-                    crc = (crc >> 1) ^ polynomial
-                else:
-                    crc >>= 1
-            crc_table.append(crc)
-        return crc_table
+        return generate_crc_table()
 
     def calculate_crc(self, data):
-        # Inicjalizacja wartości początkowej CRC.
-        crc = 0xFFFFFFFF
         # Obliczenie CRC dla całego ciągu danych.
-        for byte in data:
-            crc = (crc >> 8) ^ self.crc_table[(crc ^ byte) & 0xFF]
-        # Końcowe XORowanie, aby uzyskać końcową wartość CRC.
-        return crc ^ 0xFFFFFFFF
+        return self.method(data)
+
+    def calculate_batch(self, frames):
+        # Obliczenie CRC wielu ramek tej samej długości naraz.
+        return crc32_batch(frames)
+
 
 def bit_stuffing(data):
-    # Dodanie '0' do sekwencji '11111' w danych, aby uniknąć problemów z markierami.
-    return data.replace('11111', '111110')
+    # Dodanie '0' po każdych pięciu kolejnych jedynkach w danych, aby uniknąć problemów z markierami.
+    # Liczy to automat BitStuffer, a nie str.replace, które nie śledzi serii jedynek.
+    return bits_to_string(stuff_bits(string_to_bits(data)))
 
 def unbit_stuffing(data):
-    # Usunięcie dodatkowego '0' po sekwencji '11111' w danych.
-    return data.replace('111110', '11111')
+    # Usunięcie dodatkowego '0' po każdych pięciu kolejnych jedynkach w danych (automat BitDestuffer).
+    return bits_to_string(BitDestuffer().feed(string_to_bits(data)))
+
+
+# Wspólny kalkulator CRC dla ramkowania i weryfikacji.
+crc_calculator = CRC32()
 
 
 def frame_data(data, frame_size):
     framed_data = []
-    crc_calculator = CRC32()
     for i in range(0, len(data), frame_size):
         frame = data[i:i+frame_size]
         crc = crc_calculator.calculate_crc(frame.encode('utf-8'))
@@ -66,8 +185,11 @@ def verify_frame(frame):
         crc_part = frame[-40:-8]
         expected_crc = int(crc_part, 2)
         data_part_unstuffed = unbit_stuffing(data_part)
-        actual_crc = CRC32().calculate_crc(data_part_unstuffed.encode('utf-8'))
-        print(f"Expected CRC: {expected_crc}, Actual CRC: {actual_crc}, Data Unstuffed: {data_part_unstuffed}")
+        actual_crc = crc_calculator.calculate_crc(data_part_unstuffed.encode('utf-8'))
+        # Wypis diagnostyczny tylko przy włączonym logowaniu (poziom DEBUG); print dla milionów ramek
+        # zajmował więcej czasu niż sama weryfikacja.
+        logger.debug("Expected CRC: %s, Actual CRC: %s, Data Unstuffed: %s", expected_crc, actual_crc,
+                     data_part_unstuffed)
         return actual_crc == expected_crc, data_part_unstuffed
     else:
         return False, frame
@@ -91,29 +213,887 @@ def write_frames(frames, file_path):
         for frame in frames:
             file.write(f"{frame}\n")
 
-# Tworzenie losowych danych źródłowych
-source_data = ''.join(random.choice('01') for _ in range(500))
-with open('start_data.txt', 'w') as file:
-    for i in range(0, len(source_data), 100):
-        chunk = source_data[i:i+100]  # pobierz kolejne 100 znaków
-        file.write(f"{chunk}\n")
-# Dzielenie na ramki i dodanie CRC oraz markerów
-framed_data = frame_data(source_data, 100)
+# Tryb binarny: ramki HDLC na prawdziwych bitach zamiast znaków '0'/'1'.
+# Ramka to flaga 01111110, dane i FCS (CRC-32 danych, najmłodszy bajt najpierw) po bit stuffingu
+# i flaga końcowa. Każdy bajt jest nadawany od najmłodszego bitu, jak w HDLC, a bity są trzymane
+# w tablicach NumPy uint8 (jeden bit na element) albo spakowane po 8 w bajtach (numpy.packbits).
+FLAG = '01111110'
+FLAG_BITS = np.array([0, 1, 1, 1, 1, 1, 1, 0], dtype=np.uint8)
+FCS_BITS = 32
+
+
+def bytes_to_bits(data):
+    # Rozpakowanie bajtów (bytes, bytearray, memoryview) na bity, od najmłodszego bitu każdego bajtu.
+    return np.unpackbits(np.frombuffer(data, dtype=np.uint8), bitorder='little')
+
+
+def bits_to_bytes(bits):
+    # Spakowanie bitów z powrotem w bajty; niepełny ostatni bajt jest dopełniany zerami.
+    return np.packbits(bits, bitorder='little').tobytes()
+
+
+# Bit stuffing jako automat stanów: stanem jest długość bieżącej serii jedynek. Automat można
+# karmić kawałkami dowolnej długości (strumień wielu GB w stałej pamięci), a każdy kawałek jest
+# przetwarzany naraz w NumPy: serie jedynek to odcinki między kolejnymi zerami, więc wystarczą
+# pozycje zer, a nie pętla po bitach.
+def ones_runs(bits, carry=0):
+    # Zwraca (pozycje zer, początki serii jedynek, długości serii); serii jest o jedną więcej niż
+    # zer, ostatnia kończy kawałek. carry to seria z końca poprzedniego kawałka, doliczana do pierwszej.
+    zeros = np.flatnonzero(bits == 0)
+    starts = np.concatenate([[-carry], zeros + 1])
+    lengths = np.concatenate([zeros, [len(bits)]]) - starts
+    return zeros, starts, lengths
+
+
+class BitStuffer:
+    def __init__(self):
+        # Stan: liczba jedynek od ostatniego zera (danych albo wstawionego), 0..4.
+        self.run = 0
+
+    def feed(self, bits):
+        # Wstawienie zera po każdej piątej jedynce serii; zwraca bity po stuffingu tego kawałka.
+        bits = np.asarray(bits, dtype=np.uint8)
+        if not len(bits):
+            return bits
+        _, starts, lengths = ones_runs(bits, self.run)
+        self.run = int(lengths[-1] % 5)
+        counts = lengths // 5
+        if not counts.any():
+            return bits
+        # Pozycje piątej, dziesiątej, ... jedynki każdej długiej serii.
+        run_starts = np.repeat(starts, counts)
+        steps = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + 1
+        return np.insert(bits, run_starts + 5 * steps, 0)
+
+
+class BitDestuffer:
+    def __init__(self):
+        # Stan: długość bieżącej serii jedynek. error oznacza, że po pięciu jedynkach przyszła
+        # jedynka, czego stuffing nie mógł wytworzyć (flaga, abort albo przekłamany bit).
+        self.run = 0
+        self.error = False
+
+    def feed(self, bits):
+        # Usunięcie zera po każdej serii dokładnie pięciu jedynek; zwraca bity danych tego kawałka.
+        bits = np.asarray(bits, dtype=np.uint8)
+        if not len(bits):
+            return bits
+        zeros, _, lengths = ones_runs(bits, self.run)
+        if np.any(lengths > 5):
+            self.error = True
+        self.run = int(lengths[-1])
+        stuffed = zeros[lengths[:-1] == 5]
+        return np.delete(bits, stuffed) if len(stuffed) else bits
+
+
+def stuff_bits(bits):
+    # Bit stuffing całego bufora bitów.
+    return BitStuffer().feed(bits)
+
+
+def unstuff_bits(bits):
+    # Destuffing całego bufora; None, gdy bity nie mogły powstać ze stuffingu (ramka uszkodzona).
+    destuffer = BitDestuffer()
+    unstuffed = destuffer.feed(bits)
+    return None if destuffer.error else unstuffed
+
+
+def stuff_stream(chunks):
+    # Generator: stuffing strumienia kawałków bitów, stan automatu przechodzi między kawałkami.
+    stuffer = BitStuffer()
+    for chunk in chunks:
+        yield stuffer.feed(chunk)
+
+
+def unstuff_stream(chunks):
+    # Generator: destuffing strumienia kawałków bitów; ValueError przy bitach spoza stuffingu.
+    destuffer = BitDestuffer()
+    for chunk in chunks:
+        unstuffed = destuffer.feed(chunk)
+        if destuffer.error:
+            raise ValueError("po pięciu jedynkach przyszła jedynka: strumień nie pochodzi ze stuffingu")
+        yield unstuffed
+
+
+def stuff_bits_loop(bits):
+    # Ten sam automat bit po bicie, bez NumPy; wzorzec do sprawdzania wersji wektorowej.
+    stuffed = []
+    run = 0
+    for bit in bits:
+        stuffed.append(bit)
+        run = run + 1 if bit else 0
+        if run == 5:
+            stuffed.append(0)
+            run = 0
+    return stuffed
+
+
+def unstuff_bits_loop(bits):
+    # Destuffing bit po bicie; None, gdy po pięciu jedynkach przychodzi jedynka.
+    unstuffed = []
+    run = 0
+    for bit in bits:
+        if run == 5:
+            if bit:
+                return None
+            run = 0
+            continue
+        unstuffed.append(bit)
+        run = run + 1 if bit else 0
+    return unstuffed
+
+
+def encode_frame_bits(payload, fec=None):
+    # Zbudowanie ramki binarnej: flaga + stuffing(dane + FCS) + flaga, jako tablica bitów.
+    # Z fec ('hamming' albo 'rs') dane + FCS są przed stuffingiem kodowane korekcyjnie (fec_encode).
+    fcs = crc32_zlib(payload).to_bytes(4, 'little')
+    if fec is None:
+        body = stuff_bits(np.concatenate([bytes_to_bits(payload), bytes_to_bits(fcs)]))
+    else:
+        body = stuff_bits(bytes_to_bits(fec_encode(bytes(payload) + fcs, fec)))
+    return np.concatenate([FLAG_BITS, body, FLAG_BITS])
+
+
+def decode_frame_bits(bits, fec=None):
+    # Weryfikacja ramki binarnej: flagi, destuffing, pełne bajty i zgodność FCS.
+    # Zwraca (czy poprawna, dane jako bytes).
+    bits = np.asarray(bits, dtype=np.uint8)
+    if len(bits) < 16 or not (np.array_equal(bits[:8], FLAG_BITS) and np.array_equal(bits[-8:], FLAG_BITS)):
+        return False, b''
+    return decode_body_bits(bits[8:-8], fec)
+
+
+def decode_body_bits(stuffed, fec=None):
+    # Weryfikacja wnętrza ramki (bez flag): destuffing, pełne bajty, korekcja błędów (z fec) i zgodność FCS.
+    # Z fec ramka, której kod nie poprawił, jest jeszcze dekodowana z innym destuffingiem (repair_slips).
+    if fec is None:
+        body = unstuff_bits(stuffed)
+        return (False, b'') if body is None else check_body(body)
+    destuffer = BitDestuffer()
+    body = destuffer.feed(stuffed)
+    crc_ok, payload = check_body(body, fec)  # Sześć jedynek też: to mógł być przekłamany bit danych
+    if crc_ok:
+        return crc_ok, payload
+    return repair_slips(stuffed, body, fec) or (False, b'')
+
+
+def check_body(body, fec=None):
+    # Pełne bajty, korekcja błędów (z fec) i zgodność FCS wnętrza ramki po destuffingu.
+    if len(body) % 8:
+        return False, b''
+    block = bits_to_bytes(body)
+    if fec is not None:
+        block, _ = fec_decode(block, fec)
+    if block is None or len(block) < FCS_BITS // 8:
+        return False, b''
+    payload = block[:-FCS_BITS // 8]
+    fcs = int.from_bytes(block[-FCS_BITS // 8:], 'little')
+    return crc32_zlib(payload) == fcs, payload
+
+
+def frame_bytes(data, frame_size, fec=None):
+    # Podział danych binarnych na ramki po frame_size bajtów; zwraca listę ramek jako tablice bitów.
+    data = memoryview(data).cast('B')
+    return [encode_frame_bits(data[i:i + frame_size], fec) for i in range(0, len(data), frame_size)]
+
+
+def pack_frames(frames):
+    # Spakowanie ramek binarnych jedna za drugą w bajty; zwraca (bajty, liczba bitów).
+    bits = np.concatenate(frames) if len(frames) else np.zeros(0, dtype=np.uint8)
+    return bits_to_bytes(bits), len(bits)
+
+
+def unpack_bits(packed, n_bits):
+    # Odwrotność pack_frames: ciąg bitów z pierwszych n_bits bitów spakowanych bajtów.
+    return bytes_to_bits(packed)[:n_bits]
+
+
+# Konwersja między trybem tekstowym (znaki '0'/'1', do nauki) a trybem binarnym.
+def string_to_bits(text):
+    # Napis z '0' i '1' zamieniony na tablicę bitów.
+    bits = np.frombuffer(text.encode('ascii'), dtype=np.uint8) - ord('0')
+    if bits.size and bits.max() > 1:
+        raise ValueError("napis może zawierać tylko znaki '0' i '1'")
+    return bits
+
+
+def bits_to_string(bits):
+    # Tablica bitów zamieniona na napis z '0' i '1'.
+    return (np.asarray(bits, dtype=np.uint8) + ord('0')).tobytes().decode('ascii')
+
+
+def string_frame_to_binary(frame, fec=None):
+    # Ramka trybu tekstowego przepisana na ramkę binarną (tablica bitów, jak z encode_frame_bits):
+    # destuffing danych, znaki '0'/'1' jako bajty danych (to po nich liczone jest CRC trybu tekstowego),
+    # FCS przepisany z 32 znaków (najstarszy bit najpierw) na 4 bajty od najmłodszego i stuffing całości.
+    # FCS jest przenoszony, a nie liczony od nowa, więc uszkodzona ramka zostaje uszkodzona.
+    if len(frame) < 48 or not (frame.startswith(FLAG) and frame.endswith(FLAG)):
+        raise ValueError("ramka tekstowa musi mieć flagi i 32 bity CRC")
+    data = unstuff_bits(string_to_bits(frame[8:-40]))
+    if data is None:
+        raise ValueError("dane ramki tekstowej nie mogły powstać ze stuffingu")
+    block = bits_to_string(data).encode('ascii') + int(frame[-40:-8], 2).to_bytes(4, 'little')
+    body = bytes_to_bits(block if fec is None else fec_encode(block, fec))
+    return np.concatenate([FLAG_BITS, stuff_bits(body), FLAG_BITS])
+
+
+def binary_frame_to_string(bits, fec=None):
+    # Odwrotność string_frame_to_binary: ramka binarna z danymi ze znaków '0'/'1' jako ramka tekstowa,
+    # z tym samym FCS zapisanym jako 32 znaki po danych. Z fec kod korekcyjny poprawia ramkę po drodze.
+    bits = np.asarray(bits, dtype=np.uint8)
+    if len(bits) < 16 or not (np.array_equal(bits[:8], FLAG_BITS) and np.array_equal(bits[-8:], FLAG_BITS)):
+        raise ValueError("ramka binarna musi zaczynać się i kończyć flagą")
+    body = unstuff_bits(bits[8:-8])
+    if body is None or len(body) % 8:
+        raise ValueError("wnętrze ramki binarnej nie mogło powstać ze stuffingu pełnych bajtów")
+    block = bits_to_bytes(body) if fec is None else fec_decode(bits_to_bytes(body), fec)[0]
+    if block is None or len(block) < FCS_BITS // 8:
+        raise ValueError("ramka binarna nie ma danych i FCS")
+    if block[:-FCS_BITS // 8].strip(b'01'):
+        raise ValueError("tylko dane ze znaków '0' i '1' mają odpowiednik w trybie tekstowym")
+    text = block[:-FCS_BITS // 8].decode('ascii')
+    fcs = int.from_bytes(block[-FCS_BITS // 8:], 'little')
+    return FLAG + bit_stuffing(text) + f"{fcs:032b}" + FLAG
+
+
+# Strumieniowe ramkowanie plików: każdy etap to generator, który pobiera dane od poprzedniego
+# dopiero wtedy, gdy następny o nie poprosi, więc plik większy niż RAM przechodzi w jednym
+# przebiegu w ograniczonej pamięci.
+# Kodowanie: plik -> kawałki -> dane ramek -> ramki (CRC, stuffing, flagi) -> bajty -> plik.
+# Dekodowanie: plik -> kawałki -> skaner flag (wnętrza ramek, weryfikacja) -> plik.
+FRAME_SIZE = 1024  # Bajtów danych w ramce binarnej
+CHUNK_SIZE = 1 << 16  # Bajtów czytanych z pliku naraz
+WRITE_BUFFER = 1 << 20
+MAX_FRAME_SIZE = 1 << 16  # Dłuższe wnętrze ramki jest odrzucane i dekoder szuka następnej flagi
+
+
+def encoded_frame_size(frame_size, fec=None):
+    # Bajtów wnętrza ramki (dane + FCS) o frame_size bajtach danych po kodowaniu korekcyjnym;
+    # bez kodu frame_size, jak w oszacowaniach skanera.
+    return frame_size if fec is None else fec_size(frame_size + FCS_BITS // 8, fec)
+
+
+def read_chunks(file_path, chunk_size=CHUNK_SIZE):
+    # Czytanie pliku kawałkami stałej wielkości.
+    with open(file_path, 'rb') as file:
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def split_payloads(chunks, frame_size=FRAME_SIZE):
+    # Podział strumienia kawałków na dane kolejnych ramek po frame_size bajtów (ostatnia może być krótsza).
+    pending = bytearray()
+    for chunk in chunks:
+        pending += chunk
+        full = len(pending) - len(pending) % frame_size
+        for i in range(0, full, frame_size):
+            yield bytes(pending[i:i + frame_size])
+        del pending[:full]
+    if pending:
+        yield bytes(pending)
+
+
+def encode_payloads(payloads, fec=None):
+    # Zamiana danych na ramki binarne (tablice bitów).
+    for payload in payloads:
+        yield encode_frame_bits(payload, fec)
+
+
+def pack_bit_stream(bit_chunks):
+    # Pakowanie strumienia bitów w bajty; bity, które nie wypełniły bajtu, czekają na następny kawałek.
+    # Ostatni bajt jest dopełniany zerami, które dekoder pomija jako śmieci po ostatniej fladze.
+    pending = np.zeros(0, dtype=np.uint8)
+    for bits in bit_chunks:
+        bits = np.concatenate([pending, bits])
+        full = len(bits) - len(bits) % 8
+        if full:
+            yield bits_to_bytes(bits[:full])
+        pending = bits[full:]
+    if len(pending):
+        yield bits_to_bytes(pending)
+
+
+def write_chunks(chunks, file_path, buffer_size=WRITE_BUFFER):
+    # Buforowany zapis binarny kolejnych kawałków; zwraca liczbę zapisanych bajtów.
+    written = 0
+    with open(file_path, 'wb', buffering=buffer_size) as file:
+        for chunk in chunks:
+            file.write(chunk)
+            written += len(chunk)
+    return written
+
+
+def frame_file(source_path, target_path, frame_size=FRAME_SIZE, chunk_size=CHUNK_SIZE, fec=None):
+    # Ramkowanie pliku w jednym przebiegu; zwraca liczbę bajtów zapisanych do target_path.
+    frames = encode_payloads(split_payloads(read_chunks(source_path, chunk_size), frame_size), fec)
+    return write_chunks(pack_bit_stream(frames), target_path)
+
+
+# Skaner flag: odbierany strumień to jeden ciąg bitów z ramkami jedna za drugą, a flagi nie muszą
+# leżeć na granicy bajtu. Zamiast rozpakowywać wszystkie bity szukamy flag w spakowanych bajtach:
+# flaga zaczynająca się k bitów w głąb bajtu i to jej początek w górnych bitach bajtu i oraz koniec
+# w dolnych k bitach bajtu i + 1. Dwie tablice po 256 masek mówią, dla których k bajt pasuje jako
+# pierwszy i jako drugi, więc całe wyszukiwanie to dwa odczyty z tablic i AND na bajt. Rozpakowywane
+# są tylko bity wnętrz ramek. Po przekłamanej fladze dwie ramki zlewają się w jedną, która nie
+# przechodzi weryfikacji, a skaner synchronizuje się na następnej poprawnej fladze.
+FLAG_BYTE = 0x7E
+
+
+def generate_flag_tables():
+    # FLAG_FIRST[v] ma bit k, gdy bity k..7 bajtu v to początek flagi, FLAG_SECOND[v], gdy bity 0..k-1 to jej koniec.
+    first = np.zeros(256, dtype=np.uint8)
+    second = np.zeros(256, dtype=np.uint8)
+    for value in range(256):
+        for k in range(8):
+            if value >> k == FLAG_BYTE & ((1 << (8 - k)) - 1):
+                first[value] |= 1 << k
+            if value & ((1 << k) - 1) == FLAG_BYTE >> (8 - k):
+                second[value] |= 1 << k
+    return first, second
+
+
+FLAG_FIRST, FLAG_SECOND = generate_flag_tables()
+
+
+def find_flag_offsets(buffer):
+    # Bitowe pozycje początków flag w spakowanym buforze (bity od najmłodszego), rosnąco.
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    if not len(data):
+        return np.zeros(0, dtype=np.int64)
+    matches = FLAG_FIRST[data[:-1]] & FLAG_SECOND[data[1:]]
+    candidates = np.flatnonzero(matches)
+    rows, shifts = np.nonzero(np.unpackbits(matches[candidates, None], axis=1, bitorder='little'))
+    offsets = candidates[rows] * 8 + shifts
+    if data[-1] == FLAG_BYTE:
+        offsets = np.append(offsets, 8 * (len(data) - 1))  # Flaga w ostatnim bajcie nie ma pary
+    return offsets
+
+
+def scan_buffer(buffer, max_frame_size=MAX_FRAME_SIZE, base_offset=0, fec=None):
+    # Dekodowanie wszystkich ramek zamkniętych flagami w buforze. Zwraca (lista krotek
+    # (pozycja flagi otwierającej w bitach, dane, czy CRC się zgadza), pozycja ostatniej flagi albo None).
+    limit = 8 * encoded_frame_size(max_frame_size, fec) * 6 // 5 + 8 * 4 * 2
+    frames = []
+    previous = None
+    for flag in find_flag_offsets(buffer).tolist():
+        if previous is not None and flag < previous + 8:
+            continue  # Flaga nakładająca się na poprzednią
+        if previous is not None and flag > previous + 8:  # Dwie flagi obok siebie to przerwa między ramkami
+            start, stop = previous + 8, flag
+            if stop - start > limit:
+                frames.append((base_offset + previous, b'', False))
+            else:
+                bits = bytes_to_bits(buffer[start // 8:(stop + 7) // 8])[start % 8:start % 8 + stop - start]
+                crc_ok, payload = decode_body_bits(bits, fec)
+                frames.append((base_offset + previous, payload, crc_ok))
+        previous = flag
+    return frames, previous
+
+
+def scan_frames(buffer, max_frame_size=MAX_FRAME_SIZE, fec=None):
+    # Generator krotek (pozycja w bitach, dane, czy CRC się zgadza) dla ciągłego bufora ramek.
+    frames, _ = scan_buffer(buffer, max_frame_size, fec=fec)
+    yield from frames
+
+
+def scan_stream(chunks, max_frame_size=MAX_FRAME_SIZE, fec=None):
+    # To samo dla strumienia kawałków bajtów: bajty od ostatniej flagi czekają na następny kawałek,
+    # a pozycje są liczone od początku strumienia. Bez flagi (albo gdy od ostatniej flagi minęło
+    # więcej niż 2 * max_frame_size bajtów po zakodowaniu) zostaje tylko ostatni bajt, bo mogła się
+    # w nim zacząć flaga; za zbyt długie wnętrze ramki zgłaszana jest wtedy uszkodzona ramka, jak
+    # w scan_frames dla całego bufora.
+    window = 2 * encoded_frame_size(max_frame_size, fec)
+    pending = b''
+    base = 0  # Pozycja pending w strumieniu, w bitach
+    for chunk in chunks:
+        buffer = pending + chunk
+        frames, last = scan_buffer(buffer, max_frame_size, base, fec)
+        yield from frames
+        keep = last // 8 if last is not None else len(buffer) - 1
+        if len(buffer) - keep > window:
+            if last is not None:
+                yield base + last, b'', False
+            keep = len(buffer) - 1
+        base += 8 * keep
+        pending = buffer[keep:]
+
+
+def unframe_file(source_path, target_path, chunk_size=CHUNK_SIZE, max_frame_size=MAX_FRAME_SIZE, fec=None):
+    # Dekodowanie pliku ramek w jednym przebiegu: dane poprawnych ramek trafiają do target_path.
+    # Zwraca (liczba poprawnych ramek, liczba uszkodzonych ramek).
+    counts = [0, 0]
+
+    def valid_payloads():
+        for _, payload, is_valid in scan_stream(read_chunks(source_path, chunk_size), max_frame_size, fec):
+            counts[0 if is_valid else 1] += 1
+            if is_valid:
+                yield payload
+
+    write_chunks(valid_payloads(), target_path)
+    return counts[0], counts[1]
+
+
+# Korekcja błędów (FEC): CRC tylko wykrywa przekłamanie i ramkę trzeba nadać jeszcze raz, a kod
+# korekcyjny dokłada nadmiarowe bity, z których odbiornik sam naprawia błąd bez retransmisji.
+# Kodowane są dane + FCS przed stuffingiem, więc CRC dalej sprawdza wynik korekcji. Oba kody
+# działają na tablicach i NumPy dla całej ramki naraz:
+# - 'hamming': SECDED (8,4), czyli Hamming(7,4) z bitem parzystości całego słowa. Każdy półbajt to
+#   jeden bajt kodu (dwa razy dłuższa ramka); poprawia jeden błędny bit w bajcie kodu i wykrywa dwa.
+# - 'rs': Reed–Solomon nad GF(256), bloki do RS_BLOCK bajtów z RS_PARITY bajtami parzystości
+#   (skrócony RS(255, 247), narzut ok. 3%); poprawia do RS_PARITY // 2 dowolnych bajtów w bloku.
+#   Kod jest liniowy, więc parzystość i syndromy to XOR wierszy tablic dla par (pozycja, bajt), jak
+#   w crc32_batch. Berlekamp–Massey, Chien i Forney liczą się tylko dla bloków z niezerowym syndromem.
+# Przekłamanie, które tworzy albo usuwa bit wstawiony przez stuffing, przesuwa resztę ramki i tego
+# sam kod nie naprawi; repair_slips próbuje wtedy innego destuffingu w pobliżu miejsca, w którym kod
+# przestał poprawiać. fec_report mierzy, ile ramek mimo to wymaga retransmisji.
+FEC_SCHEMES = ('hamming', 'rs')
+RS_BLOCK = 255
+RS_PARITY = 8
+GF_POLYNOMIAL = 0x11D
+
+
+def generate_hamming_tables():
+    # HAMMING_ENCODE[n]: bajt kodu półbajtu n (bity 0..6 to pozycje 1..7: p1 p2 d0 p3 d1 d2 d3, bit 7
+    # to parzystość całości). HAMMING_DECODE[c]: półbajt z bajtu c po korekcji, HAMMING_STATUS[c]:
+    # 0 bez błędu, 1 poprawiony jeden bit, 2 błąd niepoprawialny (dwa bity).
+    encode = np.zeros(16, dtype=np.uint8)
+    for nibble in range(16):
+        d = [(nibble >> i) & 1 for i in range(4)]
+        bits = [d[0] ^ d[1] ^ d[3], d[0] ^ d[2] ^ d[3], d[0], d[1] ^ d[2] ^ d[3], d[1], d[2], d[3]]
+        encode[nibble] = sum(bit << i for i, bit in enumerate(bits)) | (sum(bits) & 1) << 7
+    decode = np.zeros(256, dtype=np.uint8)
+    status = np.zeros(256, dtype=np.uint8)
+    for code in range(256):
+        syndrome = 0  # XOR pozycji jedynek: 0 dla słowa kodowego, inaczej pozycja błędnego bitu
+        for position in range(1, 8):
+            if code >> (position - 1) & 1:
+                syndrome ^= position
+        if bin(code).count('1') & 1:  # Nieparzysta liczba jedynek: jeden błąd, w bicie 7 przy syndromie 0
+            fixed = code ^ (1 << (syndrome - 1) if syndrome else 0x80)
+            status[code] = 1
+        else:
+            fixed = code
+            status[code] = 2 if syndrome else 0
+        decode[code] = (fixed >> 2 & 1) | (fixed >> 4 & 1) << 1 | (fixed >> 5 & 1) << 2 | (fixed >> 6 & 1) << 3
+    return encode, decode, status
+
+
+HAMMING_ENCODE, HAMMING_DECODE, HAMMING_STATUS = generate_hamming_tables()
+
+
+def hamming_encode(data):
+    # Każdy bajt danych to dwa bajty kodu: najpierw młodszy półbajt, potem starszy.
+    data = np.frombuffer(data, dtype=np.uint8)
+    return np.stack([HAMMING_ENCODE[data & 0x0F], HAMMING_ENCODE[data >> 4]], axis=1).tobytes()
+
+
+def hamming_decode(data):
+    # Zwraca (dane albo None przy błędzie niepoprawialnym, liczba poprawionych bitów).
+    codes = np.frombuffer(data, dtype=np.uint8)
+    if len(codes) % 2:
+        return None, 0
+    status = HAMMING_STATUS[codes]
+    if np.any(status == 2):
+        return None, 0
+    nibbles = HAMMING_DECODE[codes]
+    return (nibbles[0::2] | nibbles[1::2] << 4).tobytes(), int(np.count_nonzero(status))
+
+
+def generate_gf_tables():
+    # GF_EXP[i] = alfa^i (dwa okresy, żeby nie liczyć modulo 255), GF_LOG odwrotnie, GF_MUL pełna
+    # tablica mnożenia 256 x 256.
+    exp = np.zeros(512, dtype=np.uint8)
+    log = np.zeros(256, dtype=np.int64)
+    x = 1
+    for i in range(255):
+        exp[i] = x
+        log[x] = i
+        x <<= 1
+        if x & 0x100:
+            x ^= GF_POLYNOMIAL
+    exp[255:510] = exp[:255]
+    mul = np.zeros((256, 256), dtype=np.uint8)
+    mul[1:, 1:] = exp[log[1:, None] + log[None, 1:]]
+    return exp, log, mul
+
+
+GF_EXP, GF_LOG, GF_MUL = generate_gf_tables()
+
+
+def gf_mul(a, b):
+    return int(GF_MUL[a, b])
+
+
+def gf_div(a, b):
+    return int(GF_EXP[(GF_LOG[a] - GF_LOG[b]) % 255]) if a else 0
+
+
+def gf_poly_eval(poly, x):
+    # Wartość wielomianu (współczynniki od najniższej potęgi) w punkcie x, schematem Hornera.
+    result = 0
+    for coefficient in reversed(poly):
+        result = gf_mul(result, x) ^ coefficient
+    return result
+
+
+def generate_rs_tables():
+    # RS_ENCODE[j, v]: bajty parzystości bloku, który ma tylko bajt v na pozycji j danych,
+    # RS_SYNDROME[j, v]: syndromy bloku z bajtem v na pozycji j słowa kodowego (v * alfa^(i * (254 - j))).
+    # Blok skrócony jest dopełniany zerami na początku, które nie zmieniają ani parzystości, ani syndromów.
+    generator = [1]  # Iloczyn (x - alfa^i) dla i = 0..RS_PARITY-1, współczynniki od najwyższej potęgi
+    for i in range(RS_PARITY):
+        root = int(GF_EXP[i])
+        generator = [a ^ gf_mul(b, root) for a, b in zip(generator + [0], [0] + generator)]
+    k = RS_BLOCK - RS_PARITY
+    unit = np.zeros((k, RS_PARITY), dtype=np.uint8)  # Reszty z dzielenia bloków z jedynką na pozycji j
+    messages = np.eye(k, dtype=np.uint8)
+    for j in range(k):
+        feedback = messages[:, j] ^ unit[:, 0]
+        unit[:, :-1] = unit[:, 1:]
+        unit[:, -1] = 0
+        unit ^= GF_MUL[feedback[:, None], np.array(generator[1:], dtype=np.uint8)]
+    values = np.arange(256)
+    encode = GF_MUL[values[None, :, None], unit[:, None, :]]
+    powers = GF_EXP[(np.arange(RS_PARITY)[None, :] * (RS_BLOCK - 1 - np.arange(RS_BLOCK))[:, None]) % 255]
+    syndrome = GF_MUL[values[None, :, None], powers[:, None, :]]
+    return encode, syndrome
+
+
+RS_ENCODE, RS_SYNDROME = generate_rs_tables()
+
+
+def rs_encode(data):
+    # Kod systematyczny: bloki po RS_BLOCK - RS_PARITY bajtów danych, każdy z RS_PARITY bajtami
+    # parzystości na końcu; ostatni blok może być krótszy (skrócony).
+    data = np.frombuffer(data, dtype=np.uint8)
+    k = RS_BLOCK - RS_PARITY
+    full, rest = divmod(len(data), k)
+    messages = np.zeros((full + bool(rest), k), dtype=np.uint8)
+    messages[:full] = data[:full * k].reshape(full, k)
+    if rest:
+        messages[-1, k - rest:] = data[full * k:]
+    parity = np.bitwise_xor.reduce(RS_ENCODE[np.arange(k), messages], axis=1)
+    blocks = np.concatenate([messages, parity], axis=1)
+    return blocks[:full].tobytes() + (blocks[-1, k - rest:].tobytes() if rest else b'')
+
+
+def rs_correct(codeword, syndromes, start=0):
+    # Poprawienie jednego bloku (lista RS_BLOCK bajtów, dopełnienie skróconego bloku do pozycji start).
+    # Zwraca (poprawiony blok, liczba poprawionych bajtów) albo None, gdy błędów jest za dużo.
+    # Berlekamp–Massey: wielomian lokalizatorów błędów (współczynniki od najniższej potęgi).
+    locator, previous = [1], [1]
+    length, shift, scale = 0, 1, 1
+    for n, syndrome in enumerate(syndromes):
+        delta = syndrome
+        for i in range(1, min(length + 1, len(locator))):
+            delta ^= gf_mul(locator[i], syndromes[n - i])
+        if not delta:
+            shift += 1
+            continue
+        factor = gf_div(delta, scale)
+        update = [0] * shift + [gf_mul(coefficient, factor) for coefficient in previous]
+        corrected = [a ^ b for a, b in itertools.zip_longest(locator, update, fillvalue=0)]
+        if 2 * length <= n:
+            previous, length, scale, shift = locator, n + 1 - length, delta, 1
+        else:
+            shift += 1
+        locator = corrected
+    while len(locator) > 1 and not locator[-1]:
+        locator.pop()
+    if 2 * length > len(syndromes) or len(locator) - 1 != length:
+        return None
+    # Chien: bajt na pozycji j ma lokalizator X = alfa^(254 - j), błąd jest tam, gdzie locator(1 / X) = 0.
+    positions = [j for j in range(start, RS_BLOCK) if not gf_poly_eval(locator, int(GF_EXP[(j + 1) % 255]))]
+    if len(positions) != length:
+        return None
+    # Forney: wartość błędu to X * omega(1 / X) / locator'(1 / X), omega = syndromy * locator mod x^RS_PARITY.
+    omega = [0] * len(syndromes)
+    for i, syndrome in enumerate(syndromes):
+        for j, coefficient in enumerate(locator[:len(syndromes) - i]):
+            omega[i + j] ^= gf_mul(syndrome, coefficient)
+    derivative = [coefficient if i % 2 else 0 for i, coefficient in enumerate(locator)][1:]
+    codeword = list(codeword)
+    for j in positions:
+        x_inverse = int(GF_EXP[(j + 1) % 255])
+        magnitude = gf_div(gf_poly_eval(omega, x_inverse), gf_poly_eval(derivative, x_inverse))
+        codeword[j] ^= gf_mul(int(GF_EXP[RS_BLOCK - 1 - j]), magnitude)
+    return codeword, length
+
+
+def rs_blocks(codes):
+    # Bloki RS_BLOCK bajtów kodu (ostatni skrócony blok dopełniony zerami na początku) i ich syndromy;
+    # None, gdy ostatni blok jest za krótki, by mieć dane.
+    full, rest = divmod(len(codes), RS_BLOCK)
+    if 0 < rest <= RS_PARITY:
+        return None
+    blocks = np.zeros((full + bool(rest), RS_BLOCK), dtype=np.uint8)
+    blocks[:full] = codes[:full * RS_BLOCK].reshape(full, RS_BLOCK)
+    if rest:
+        blocks[-1, RS_BLOCK - rest:] = codes[full * RS_BLOCK:]
+    return blocks, np.bitwise_xor.reduce(RS_SYNDROME[np.arange(RS_BLOCK), blocks], axis=1)
+
+
+def rs_decode(data):
+    # Zwraca (dane albo None, gdy któregoś bloku nie da się poprawić, liczba poprawionych bajtów).
+    codes = np.frombuffer(data, dtype=np.uint8)
+    split = rs_blocks(codes)
+    if split is None:
+        return None, 0
+    blocks, syndromes = split
+    k = RS_BLOCK - RS_PARITY
+    full, rest = divmod(len(codes), RS_BLOCK)
+    corrected = 0
+    for row in np.flatnonzero(syndromes.any(axis=1)).tolist():
+        start = RS_BLOCK - rest if rest and row == full else 0
+        fixed = rs_correct(blocks[row].tolist(), syndromes[row].tolist(), start)
+        if fixed is None:
+            return None, corrected
+        blocks[row] = fixed[0]
+        corrected += fixed[1]
+    return blocks[:full, :k].tobytes() + (blocks[-1, RS_BLOCK - rest:k].tobytes() if rest else b''), corrected
+
+
+FEC_CODECS = {'hamming': (hamming_encode, hamming_decode), 'rs': (rs_encode, rs_decode)}
+
+
+def fec_codec(fec):
+    if fec not in FEC_CODECS:
+        raise ValueError(f"nieznany kod korekcyjny {fec!r}, dostępne: {', '.join(FEC_CODECS)}")
+    return FEC_CODECS[fec]
+
+
+def fec_encode(data, fec):
+    # Zakodowanie bajtów kodem fec ('hamming' albo 'rs').
+    return fec_codec(fec)[0](data)
+
+
+def fec_decode(data, fec):
+    # Dekodowanie z korekcją; zwraca (dane albo None przy błędzie niepoprawialnym, liczba poprawek).
+    return fec_codec(fec)[1](data)
+
+
+def fec_size(n, fec):
+    # Liczba bajtów po zakodowaniu n bajtów kodem fec (None: bez kodu).
+    if fec is None:
+        return n
+    if fec == 'hamming':
+        return 2 * n
+    full, rest = divmod(n, RS_BLOCK - RS_PARITY)
+    return full * RS_BLOCK + (rest + RS_PARITY if rest else 0)
+
+
+def fec_failure(data, fec):
+    # Zakres bajtów kodu (początek, koniec), w którym zaczyna się błąd niepoprawialny, albo None.
+    # Hamming: wszystko do pierwszego bajtu z dwoma błędami, bo przesunięte bajty kodu powtarzalnych
+    # danych długo wyglądają na poprawne. RS: pierwszy blok, którego nie da się poprawić, i blok
+    # przed nim, który po przesunięciu mógł zostać "poprawiony" na inne słowo kodowe.
+    codes = np.frombuffer(data, dtype=np.uint8)
+    if fec == 'hamming':
+        failed = np.flatnonzero(HAMMING_STATUS[codes] == 2)
+        return (0, int(failed[0]) + 1) if len(failed) else None
+    split = rs_blocks(codes)
+    if split is None:
+        return max(len(codes) - 2 * RS_BLOCK, 0), len(codes)
+    blocks, syndromes = split
+    rest = len(codes) % RS_BLOCK
+    for row in np.flatnonzero(syndromes.any(axis=1)).tolist():
+        start = RS_BLOCK - rest if rest and row == len(codes) // RS_BLOCK else 0
+        if rs_correct(blocks[row].tolist(), syndromes[row].tolist(), start) is None:
+            return max(row - 1, 0) * RS_BLOCK, min((row + 1) * RS_BLOCK, len(codes))
+    return None
+
+
+def slip_candidates(stuffed):
+    # Miejsca, w których jedno przekłamanie mogło zmienić destuffing, jako krotki
+    # (pozycja w bitach po stuffingu, 'keep' albo 'drop'):
+    # - keep: zero po pięciu jedynkach, usunięte przez destuffing, mogło być bitem danych (jedynka
+    #   przed nim powstała z przekłamania);
+    # - drop: zero po pięciu bitach z czterema jedynkami mogło być bitem stuffingu (jedna z jedynek
+    #   zamieniła się w zero);
+    # - drop przy szóstej jedynce: bit stuffingu zamienił się w jedynkę.
+    zeros, starts, lengths = ones_runs(stuffed)
+    candidates = [(zero, 'keep') for zero in zeros[lengths[:-1] == 5].tolist()]
+    ones = np.convolve(stuffed, np.ones(5, dtype=np.int64))[4:]  # ones[k]: jedynki w bitach k..k+4
+    near = zeros[(zeros >= 5) & (lengths[:-1] < 5)]
+    candidates += [(zero, 'drop') for zero in near[ones[near - 5] == 4].tolist()]
+    candidates += [(start + 5, 'drop') for start in starts[lengths > 5].tolist()]
+    return candidates
+
+
+def repair_slips(stuffed, body, fec):
+    # Ponowne dekodowanie wnętrza ramki z innym destuffingiem w jednym miejscu (slip_candidates),
+    # zaczynając od miejsc najbliższych błędowi wskazanemu przez fec_failure. Zwraca (True, dane)
+    # dla pierwszego wariantu, który przeszedł korekcję i CRC, albo None.
+    # Naprawia jedno przekłamanie na ramkę, które przesunęło resztę ramki; dwa takie przekłamania,
+    # przekłamanie w fladze albo fałszywa flaga w środku ramki (scan_frames dzieli wtedy ramkę na
+    # dwie) dalej wymagają retransmisji, a CRC-32 zostaje jedyną ochroną przed błędną naprawą.
+    zeros, _, lengths = ones_runs(stuffed)
+    removed = zeros[lengths[:-1] == 5]  # Bity usunięte przez zwykły destuffing
+    window = fec_failure(bits_to_bytes(body), fec)
+    candidates = []
+    for position, action in slip_candidates(stuffed):
+        index = position - int(np.searchsorted(removed, position))  # Pozycja w bitach po destuffingu
+        if window is None or 8 * window[0] <= index < 8 * window[1]:
+            candidates.append((index, position, action))
+    for index, position, action in sorted(candidates, reverse=True):
+        if action == 'keep':
+            alternative = np.insert(body, index, 0)
+        elif stuffed[position]:  # Szósta jedynka: bit stuffingu, więc usunięty, a seria się kończy
+            changed = stuffed.copy()
+            changed[position] = 0
+            alternative = BitDestuffer().feed(changed)
+        else:
+            alternative = np.delete(body, index)
+        crc_ok, payload = check_body(alternative, fec)
+        if crc_ok:
+            return crc_ok, payload
+    return None
+
+
+def corrupt_frame_bits(bits, corruption_probability=0.3, rng=random):
+    # Odpowiednik corrupt_frame dla ramki binarnej: z danym prawdopodobieństwem odwraca jeden losowy
+    # bit między flagami.
+    if rng.random() < corruption_probability:
+        bits = bits.copy()
+        bits[rng.randint(8, len(bits) - 9)] ^= 1
+    return bits
+
+
+FecResult = namedtuple('FecResult', ['fec', 'probability', 'overhead', 'encode_rate', 'decode_rate', 'damaged',
+                                     'saved', 'goodput'])
+
+
+def fec_report(probabilities=(0.0, 0.1, 0.3, 0.5, 1.0), schemes=(None,) + FEC_SCHEMES, n_frames=500,
+               frame_size=FRAME_SIZE, seed=0):
+    # Koszt i zysk korekcji dla każdego kodu (None: samo CRC) i prawdopodobieństwa przekłamania ramki:
+    # overhead to bity na łączu na bit danych, encode_rate i decode_rate przepustowość w MB/s danych,
+    # damaged to ramki do retransmisji, saved to retransmisje zaoszczędzone względem pierwszego kodu
+    # w schemes (domyślnie samego CRC),
+    # a goodput to część łącza niosąca dane, gdy uszkodzone ramki są nadawane do skutku.
+    # Ramka k jest psuta generatorem z ziarnem (seed, k), więc każdy kod dostaje te same przekłamania.
+    data = random.Random(seed).randbytes(n_frames * frame_size)
+    results = []
+    baseline = {}
+    for fec in schemes:
+        start = time.perf_counter()
+        frames = frame_bytes(data, frame_size, fec)
+        encode_rate = len(data) / (time.perf_counter() - start) / 1e6
+        start = time.perf_counter()
+        for frame in frames:
+            decode_frame_bits(frame, fec)
+        decode_rate = len(data) / (time.perf_counter() - start) / 1e6
+        overhead = sum(len(frame) for frame in frames) / (8 * len(data))
+        for probability in probabilities:
+            damaged = sum(not decode_frame_bits(corrupt_frame_bits(frame, probability, random.Random(f"{seed}:{k}")),
+                                                fec)[0] for k, frame in enumerate(frames))
+            baseline.setdefault(probability, damaged)
+            delivered = 1 - damaged / len(frames)
+            results.append(FecResult(fec, probability, overhead, encode_rate, decode_rate, damaged,
+                                     baseline[probability] - damaged, delivered / overhead))
+    return results
+
+
+def format_fec_report(results):
+    # Tabela tekstowa wyników fec_report.
+    lines = [f"{'kod':<10}{'p':>6}{'narzut':>9}{'kod. MB/s':>11}{'dek. MB/s':>11}{'retrans.':>10}"
+             f"{'oszczędz.':>11}{'goodput':>9}"]
+    for result in results:
+        lines.append(f"{result.fec or 'CRC':<10}{result.probability:>6.2f}{result.overhead:>9.3f}"
+                     f"{result.encode_rate:>11.2f}{result.decode_rate:>11.2f}{result.damaged:>10}"
+                     f"{result.saved:>11}{result.goodput:>9.3f}")
+    return '\n'.join(lines)
+
+
+# Równoległa weryfikacja wielu ramek: ramki są dzielone na paczki, a paczki trafiają do puli
+# procesów (albo wątków: zlib.crc32 zwalnia GIL dla dużych buforów, ale reszta weryfikacji jest
+# w Pythonie, więc wątki pomagają głównie przy dużych ramkach binarnych). W locie jest najwyżej
+# kilka paczek na proces, więc ramki mogą przychodzić z generatora, np. ze skanera flag.
+VerificationResult = namedtuple('VerificationResult', ['valid', 'damaged', 'damaged_indices'])
+BATCH_SIZE = 10000  # Ramek w jednej paczce dla procesu roboczego
+
+
+def check_frame(frame, fec=None):
+    # Weryfikacja ramki dowolnego trybu: napis z '0'/'1' (tryb tekstowy) albo tablica bitów (tryb binarny,
+    # z korekcją kodem fec).
+    if isinstance(frame, str):
+        return verify_frame(frame)[0]
+    return decode_frame_bits(frame, fec)[0]
+
+
+def verify_batch(frames, start=0, fec=None):
+    # Weryfikacja jednej paczki ramek (w procesie roboczym); zwraca indeksy uszkodzonych ramek.
+    return [start + k for k, frame in enumerate(frames) if not check_frame(frame, fec)]
+
+
+def frame_batches(frames, batch_size=BATCH_SIZE):
+    # Podział ciągu ramek (także generatora) na paczki; zwraca pary (paczka, indeks pierwszej ramki).
+    iterator = iter(frames)
+    start = 0
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch, start
+        start += len(batch)
+
+
+def verify_frames_parallel(frames, n_workers=None, batch_size=BATCH_SIZE, threads=False, fec=None):
+    # Weryfikacja ramek w puli procesów (threads=True: w puli wątków); n_workers=1 liczy w tym procesie.
+    # Zwraca VerificationResult z liczbą poprawnych i uszkodzonych ramek oraz indeksami uszkodzonych.
+    damaged = []
+    total = 0
+    if n_workers == 1:
+        for batch, start in frame_batches(frames, batch_size):
+            damaged += verify_batch(batch, start, fec)
+            total += len(batch)
+        return VerificationResult(total - len(damaged), len(damaged), damaged)
+    executor = ThreadPoolExecutor if threads else ProcessPoolExecutor
+    in_flight = 2 * (n_workers or os.cpu_count() or 1)
+    with executor(max_workers=n_workers) as pool:
+        pending = deque()
+        for batch, start in frame_batches(frames, batch_size):
+            pending.append(pool.submit(verify_batch, batch, start, fec))
+            total += len(batch)
+            if len(pending) >= in_flight:
+                damaged += pending.popleft().result()  # Czekamy na najstarszą paczkę, zanim wczytamy kolejne
+        while pending:
+            damaged += pending.popleft().result()
+    return VerificationResult(total - len(damaged), len(damaged), damaged)
+
+
+if __name__ == '__main__':
+    # Wypisy weryfikacji ramek jak dawniej; logging.WARNING je wyłącza.
+    logging.basicConfig(level=logging.DEBUG, format='%(message)s')
+
+    # Tworzenie losowych danych źródłowych
+    source_data = ''.join(random.choice('01') for _ in range(500))
+    with open('start_data.txt', 'w') as file:
+        for i in range(0, len(source_data), 100):
+            chunk = source_data[i:i+100]  # pobierz kolejne 100 znaków
+            file.write(f"{chunk}\n")
+    # Dzielenie na ramki i dodanie CRC oraz markerów
+    framed_data = frame_data(source_data, 100)
+
+    # Losowo psujemy niektóre ramki
+    corrupted_frames = [corrupt_frame(frame) for frame in framed_data]
 
-# Losowo psujemy niektóre ramki
-corrupted_frames = [corrupt_frame(frame) for frame in framed_data]
+    # Zapisujemy uszkodzone ramki do pliku
+    write_frames(corrupted_frames, 'corrupted_data.txt')
 
-# Zapisujemy uszkodzone ramki do pliku
-write_frames(corrupted_frames, 'corrupted_data.txt')
+    # Odczytujemy uszkodzone ramki, weryfikujemy i naprawiamy
+    repaired_frames, damaged_frames_count = process_frames(corrupted_frames)
 
-# Odczytujemy uszkodzone ramki, weryfikujemy i naprawiamy
-repaired_frames, damaged_frames_count = process_frames(corrupted_frames)
+    # Zapisujemy poprawne ramki do nowego pliku
+    write_frames(repaired_frames, 'repaired_data.txt')
 
-# Zapisujemy poprawne ramki do nowego pliku
-write_frames(repaired_frames, 'repaired_data.txt')
+    print(f"Poprawne ramki: {len(repaired_frames)}")
+    print(f"Uszkodzone ramki: {damaged_frames_count}")
 
-print(f"Poprawne ramki: {len(repaired_frames)}")
-print(f"Uszkodzone ramki: {damaged_frames_count}")
+    # Ramki binarne z korekcją błędów: ile retransmisji oszczędzają względem samego CRC
+    print(format_fec_report(fec_report(n_frames=100)))
 #01111110 110110 10101010101010101010101010101010 01111110
 #| Marker | Dane  |               CRC               | Marker |
 